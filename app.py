@@ -1,30 +1,30 @@
 
-import streamlit as st
+import hashlib
+import os
+import shutil
+import tempfile
 import pandas as pd
-import numpy as np
+import streamlit as st
 from datetime import datetime
-from io import BytesIO
 
 from parsers import ALL_PARSERS
-from parsers.utils import normalize_pos_upc, sanitize_columns, IGNORE_UPCS
+from parsers.utils import sanitize_columns
+from pipeline import (
+    AUTO_DETECT, DEFAULT_PERF_LOG, InvoiceCache, InvoiceLedger, PerfLog, PricebookStore, process, process_stores, process_streaming,
+    DELTA_TOLERANCE, build_export, export_filenames, parse_targets, stores_zip_bytes,
+)
+
+@st.cache_resource
+def pricebook_store() -> PricebookStore:
+    # One connection for the app's lifetime, not a new one on every rerun.
+    return PricebookStore()
 
 st.set_page_config(page_title="Multi‑Vendor Invoice → POS Processor", page_icon="🧾", layout="wide")
 
-for k in ["full_export_df", "pos_update_df", "gs1_df", "unmatched_df", "ts"]:
+for k in ["full_export_df", "pos_update_df", "gs1_df", "unmatched_df", "ts", "export_paths", "exports", "perf", "stores"]:
     if k not in st.session_state:
         st.session_state[k] = None
 
-def df_to_csv_bytes(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=False).encode("utf-8")
-
-def dfs_to_xlsx_bytes(dfs: dict) -> bytes:
-    bio = BytesIO()
-    with pd.ExcelWriter(bio, engine="openpyxl") as writer:
-        for name, d in dfs.items():
-            d.to_excel(writer, sheet_name=name[:31], index=False)
-    bio.seek(0)
-    return bio.getvalue()
-
 st.title("🧾 Multi‑Vendor Invoice → POS Processor")
 st.caption("Upload a POS CSV and one or more invoice files (Unified/SVMERCH, Southern Glazer's, Nevada Beverage).")
 
@@ -32,9 +32,42 @@ with st.sidebar:
     st.markdown("### Settings")
     vendor_override = st.selectbox(
         "Vendor parser (optional override)",
-        options=["Auto‑detect"] + [p.name for p in ALL_PARSERS],
+        options=[AUTO_DETECT] + [p.name for p in ALL_PARSERS],
         index=0
     )
+    use_cache = st.checkbox("Reuse previously parsed invoices (on-disk cache)", value=True)
+    parse_workers = st.number_input("Parallel invoice parsing (worker processes)", min_value=1,
+                                    max_value=os.cpu_count() or 1, value=min(4, os.cpu_count() or 1), step=1)
+    multi_store = st.checkbox("Multi-store (one invoice batch, several pricebooks)", value=False,
+                              help="Upload one POS CSV per store: invoices are parsed once and matched against every "
+                                   "pricebook; each store's exports come bundled in one zip.")
+    low_memory = st.checkbox("Low-memory mode (stream the POS file in chunks)", value=False,
+                             help="For very large pricebooks: exports are written to disk chunk by chunk.")
+    use_arrow = st.checkbox("Arrow-backed frames (less memory per run)", value=False,
+                            help="Keep the pricebook and invoice lines as Arrow strings/numbers; Python objects are only built for the Excel workbook.")
+    use_ledger = st.checkbox("Match against full invoice history (ledger)", value=False,
+                             help="Uploaded invoices are added to a local ledger; costs come from the latest line per UPC across every invoice ever uploaded.")
+    store_off = multi_store or low_memory
+    use_store = st.checkbox("Keep the pricebook in a local store", value=False, disabled=store_off,
+                            help="Upload the POS CSV once; later runs match against the stored copy and update it in place.")
+    if store_off:
+        st.caption("The pricebook store isn't used in multi-store or low-memory mode.")
+    store = pricebook_store() if use_store and not store_off else None
+    if store is not None:
+        st.caption(f"Stored pricebook: {len(store):,} rows")
+    margin_specs = st.text_area("Goal Sheet margins (one per line)", value="40",
+                                help="`35` = 35% on every item; `dept:BEER=25,WINE=30,*=35` = by a POS column; "
+                                     "`vendor:Southern Glazer's=30` = by invoice vendor; `beer@dept:BEER=25` names the columns. The first line fills D40%/40%/Delta, "
+                                     "each extra line adds its own columns.")
+    try:
+        targets = parse_targets(margin_specs.splitlines())
+    except ValueError as e:
+        st.error(f"Goal Sheet margins: {e}")
+        targets = None
+    tolerance = st.number_input("Goal Sheet: show = for goal moves under ($)", min_value=0.0, value=DELTA_TOLERANCE,
+                                step=0.001, format="%.3f")
+    show_perf = st.checkbox("Show performance panel", value=False)
+    perf_log = st.text_input("Append stage timings to a JSON-lines file (optional)", value=DEFAULT_PERF_LOG or "")
     st.divider()
     st.markdown("**Rules:**")
     st.write("- Ignore Case Qty = 0 (arrivals only) where applicable")
@@ -42,141 +75,166 @@ with st.sidebar:
     st.write("- Dedupe by latest invoice date per UPC")
     st.write("- Ignore list: 000000000000, 003760010302, 023700052551")
 
-pos_file = st.file_uploader("Upload POS pricebook CSV", type=["csv"], accept_multiple_files=False, key="pos")
-inv_files = st.file_uploader("Upload invoice file(s) (XLSX/XLS/CSV)", type=["xlsx","xls","csv"], accept_multiple_files=True, key="inv")
-
-def autodetect_parser(file, content_head: str):
-    best = None
-    best_hits = -1
-    for p in ALL_PARSERS:
-        hits = sum(1 for t in getattr(p, "tokens", []) if t.lower() in content_head.lower())
-        if hits > best_hits:
-            best, best_hits = p, hits
-    return best
-
-def read_head_text(file, nrows=50):
-    try:
-        if file.name.lower().endswith(".csv"):
-            df = pd.read_csv(file, header=None, dtype=str, nrows=nrows)
-        else:
-            df = pd.read_excel(file, header=None, dtype=str, nrows=nrows)
-        return "\n".join(" ".join([str(x) for x in df.iloc[i].tolist()]) for i in range(len(df)))
-    except Exception:
-        return ""
-
-def process(pos_csv_file, invoice_files, vendor_choice: str):
-    pos_df = pd.read_csv(pos_csv_file, dtype=str, keep_default_na=False, na_values=[])
-    pos_upc_col = "Upc" if "Upc" in pos_df.columns else ("UPC" if "UPC" in pos_df.columns else pos_df.columns[0])
-    pos_df["UPC_norm"] = pos_df[pos_upc_col].astype(str).apply(normalize_pos_upc)
-    pos_df["cost_qty_num"]   = pd.to_numeric(pos_df.get("cost_qty", np.nan), errors="coerce")
-    pos_df["cost_cents_num"] = pd.to_numeric(pos_df.get("cost_cents", np.nan), errors="coerce")
-    cents_col = "cents" if "cents" in pos_df.columns else next((c for c in pos_df.columns if "cent" in c.lower() and c.lower()!="cost_cents"), None)
-
-    parsed_frames = []
-    for f in invoice_files:
-        if vendor_choice != "Auto‑detect":
-            parser = next(p for p in ALL_PARSERS if p.name == vendor_choice)
-        else:
-            head_text = read_head_text(f)
-            parser = autodetect_parser(f, head_text)
-        f.seek(0)
-        parsed = parser.parse(f)
-        parsed_frames.append(parsed)
-
-    inv_all = pd.concat(parsed_frames, ignore_index=True) if parsed_frames else pd.DataFrame(columns=["UPC"])
-    inv_all = inv_all[~inv_all["UPC"].isin(IGNORE_UPCS)].copy()
-    if not inv_all.empty:
-        inv_all = inv_all.sort_values(["UPC","invoice_date"]).drop_duplicates(subset=["UPC"], keep="last")
-
-    merged = pos_df.merge(
-        inv_all[["UPC","Pack","+Cost","invoice_date","Brand","Description","Size","Cost"]],
-        left_on="UPC_norm", right_on="UPC", how="left"
-    )
-    matched = merged[~merged["UPC"].isna()].copy()
-
-    matched["new_cost_qty"]   = pd.to_numeric(matched["Pack"], errors="coerce")
-    matched.loc[matched["new_cost_qty"].isna() | (matched["new_cost_qty"]<=0), "new_cost_qty"] = 1
-    matched["new_cost_cents"] = (pd.to_numeric(matched["+Cost"], errors="coerce") * 100).round().astype("Int64")
-
-    original_pos_cols = [c for c in pos_df.columns if c not in ["UPC_norm","cost_qty_num","cost_cents_num","cost_qty","cost_cents"]]
-    out = matched.copy()
-    for col in original_pos_cols:
-        if col not in out.columns:
-            out[col] = ""
-
-    out["cost_qty"]   = matched["new_cost_qty"].astype(pd.Int64Dtype())
-    out["cost_cents"] = matched["new_cost_cents"].astype(pd.Int64Dtype())
-    full_export_df = sanitize_columns(out[original_pos_cols + ["cost_qty","cost_cents"]])
-
-    qty_changed   = (matched["new_cost_qty"].astype("float64") != matched["cost_qty_num"].astype("float64"))
-    cents_changed = (matched["new_cost_cents"].astype("float64") != matched["cost_cents_num"].astype("float64"))
-    changed = matched[qty_changed | cents_changed].copy()
-    pos_update_df = sanitize_columns(full_export_df.loc[changed.index].copy())
-
-    gs1 = matched.copy()
-    gs1["+Cost"] = pd.to_numeric(gs1["+Cost"], errors="coerce")
-    gs1["Cost"]  = pd.to_numeric(gs1["Cost"], errors="coerce")
-    gs1["Pack"]  = pd.to_numeric(gs1["Pack"], errors="coerce")
-    gs1.loc[gs1["Pack"].isna() | (gs1["Pack"]<=0), "Pack"] = 1
-    gs1["Unit"]  = gs1["+Cost"] / gs1["Pack"]
-    gs1["D40%"]  = gs1["Unit"] / 0.6
-    gs1["40%"]   = (gs1["Cost"] / gs1["Pack"]) / 0.6
-
-    def cents_to_dollars(v):
-        try: return float(str(v))/100.0
-        except: return np.nan
-    gs1["$Now"] = gs1[cents_col].apply(cents_to_dollars) if cents_col else np.nan
-
-    pos_unit_cost = gs1["cost_cents_num"] / 100.0
-    with np.errstate(divide='ignore', invalid='ignore'):
-        pos_unit = pos_unit_cost / gs1["cost_qty_num"]
-        pos_d40  = pos_unit / 0.6
-    delta = gs1["D40%"] - pos_d40
-    tol = 0.005
-    gs1["Delta"] = delta.apply(lambda x: "=" if pd.notna(x) and abs(x)<tol else (round(float(x),2) if pd.notna(x) else np.nan))
-
-    gs1_out = gs1[["UPC","Brand","Description","Pack","Size","Cost","+Cost","Unit","D40%","40%","$Now","Delta"]].copy()
-    gs1_out["UPC"] = gs1_out["UPC"].astype(str).str.zfill(12)
-    gs1_out = gs1_out.dropna(subset=["+Cost"]).sort_values("UPC").reset_index(drop=True)
-
-    unmatched = inv_all[~inv_all["UPC"].isin(matched["UPC"])][["UPC","Brand","Description","Pack","+Cost","Case Qty","invoice_date"]].copy() if not inv_all.empty else pd.DataFrame()
-    return full_export_df, pos_update_df, gs1_out, unmatched
+if multi_store:
+    pos_files = st.file_uploader("Upload POS pricebook CSVs (one per store, named after the store)", type=["csv"],
+                                 accept_multiple_files=True, key="pos_multi")
+    pos_file = None
+else:
+    pos_file = st.file_uploader("Upload POS pricebook CSV", type=["csv"], accept_multiple_files=False, key="pos")
+    pos_files = []
+inv_files = st.file_uploader("Upload invoice file(s) (XLSX/XLS/CSV/PDF)", type=["xlsx","xls","csv","pdf"], accept_multiple_files=True, key="inv")
+
+def store_names(files) -> dict:
+    # Store name (file name without .csv, numbered when repeated) -> uploaded file.
+    out = {}
+    for f in files:
+        stem = os.path.splitext(f.name)[0]
+        name, n = stem, 1
+        while name in out:
+            n += 1
+            name = f"{stem} ({n})"
+        out[name] = f
+    return out
+
+def drop_export_dir():
+    # A low-memory run's exports live in a temp dir; only the latest run's is kept.
+    paths = st.session_state["export_paths"]
+    if paths:
+        shutil.rmtree(next(iter(paths.values())).parent, ignore_errors=True)
+        st.session_state["export_paths"] = None
 
 process_clicked = st.button("Process", type="primary")
-if process_clicked:
-    if not pos_file or not inv_files:
+if process_clicked and multi_store:
+    if not inv_files or not pos_files:
+        st.warning("Upload at least one POS CSV and at least one invoice file.")
+    elif targets is None:
+        st.warning("Fix the Goal Sheet margins in the sidebar first.")
+    else:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        drop_export_dir()
+        perf = PerfLog()
+        with st.spinner(f"Processing {len(pos_files)} stores…"):
+            res = process_stores(store_names(pos_files), inv_files, vendor_override,
+                                 cache=InvoiceCache() if use_cache else None, workers=int(parse_workers),
+                                 ledger=InvoiceLedger() if use_ledger else None, perf=perf, arrow=use_arrow, targets=targets, tolerance=tolerance)
+        for k in ["full_export_df", "pos_update_df", "gs1_df", "unmatched_df"]:
+            st.session_state[k] = None
+        st.session_state["stores"]  = res.stores
+        st.session_state["ts"]      = ts
+        st.session_state["exports"] = {ts: {}}
+        st.session_state["perf"]    = perf
+        if perf_log:
+            perf.write_jsonl(perf_log, run=ts)
+        st.success(f"Done! {len(res.stores)} stores processed.")
+        for name, err in res.failed:
+            st.warning(f"Store {name} failed: {err}")
+        for name, err in res.errors:
+            st.warning(f"Skipped {name}: {err}")
+elif process_clicked:
+    if not inv_files or not (pos_file or (store is not None and len(store))):
         st.warning("Upload a POS CSV and at least one invoice file.")
+    elif targets is None:
+        st.warning("Fix the Goal Sheet margins in the sidebar first.")
     else:
+        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+        drop_export_dir()
+        cache = InvoiceCache() if use_cache else None
+        ledger = InvoiceLedger() if use_ledger else None
+        perf = PerfLog()
         with st.spinner("Processing…"):
-            full_export_df, pos_update_df, gs1_out, unmatched = process(pos_file, inv_files, vendor_override)
+            if store is not None and pos_file:
+                # The uploader keeps its file across runs; only a different file replaces
+                # the stored pricebook (and the cost updates applied to it since).
+                digest = hashlib.sha256(pos_file.getvalue()).hexdigest()
+                if digest != store.digest:
+                    store.load_csv(pos_file, digest=digest)
+            if low_memory:
+                res = process_streaming(pos_file, inv_files, vendor_override, tempfile.mkdtemp(prefix="pos_export_"), ts,
+                                        cache=cache, workers=int(parse_workers), ledger=ledger, perf=perf, arrow=use_arrow, targets=targets, tolerance=tolerance)
+                full_export_df, pos_update_df, gs1_out, unmatched, errors = res.full_preview, None, res.gs1_df, res.unmatched_df, res.errors
+                n_full, n_changed = res.full_rows, res.changed_rows
+            else:
+                full_export_df, pos_update_df, gs1_out, unmatched, errors = process(
+                    None if store is not None else pos_file, inv_files, vendor_override,
+                    cache=cache, workers=int(parse_workers), store=store, ledger=ledger, perf=perf, arrow=use_arrow, targets=targets, tolerance=tolerance)
+                n_full, n_changed = len(full_export_df), len(pos_update_df)
         st.session_state["full_export_df"] = full_export_df
         st.session_state["pos_update_df"]  = pos_update_df
         st.session_state["gs1_df"]         = gs1_out
         st.session_state["unmatched_df"]   = unmatched
-        st.session_state["ts"]             = datetime.now().strftime("%Y%m%d_%H%M%S")
-        st.success(f"Done! FULL rows: {len(full_export_df)}  |  Only-changed: {len(pos_update_df)}  |  Unmatched: {len(unmatched)}")
-
-if st.session_state["full_export_df"] is not None:
+        st.session_state["ts"]             = ts
+        st.session_state["export_paths"]   = res.paths if low_memory else None
+        st.session_state["exports"]        = {ts: {}}
+        st.session_state["perf"]           = perf
+        st.session_state["stores"]         = None
+        if perf_log:
+            perf.write_jsonl(perf_log, run=ts)
+        st.success(f"Done! FULL rows: {n_full}  |  Only-changed: {n_changed}  |  Unmatched: {len(unmatched)}")
+        for name, err in errors:
+            st.warning(f"Skipped {name}: {err}")
+
+def export_bytes(kind: str) -> bytes:
+    # Each export is built on first request and kept for this run (keyed by ts), so
+    # widget reruns don't rebuild CSVs or the workbook.
+    built = st.session_state["exports"].setdefault(st.session_state["ts"], {})
+    if kind not in built:
+        paths = st.session_state["export_paths"]
+        perf = st.session_state["perf"]
+        start = len(perf.records)
+        if paths:
+            built[kind] = paths[kind].read_bytes()
+        else:
+            built[kind] = build_export(kind, st.session_state["full_export_df"], st.session_state["pos_update_df"],
+                                       st.session_state["gs1_df"], st.session_state["unmatched_df"], perf)
+        if perf_log:
+            perf.write_jsonl(perf_log, start=start, run=st.session_state["ts"])
+    return built[kind]
+
+def stores_zip() -> bytes:
+    built = st.session_state["exports"].setdefault(st.session_state["ts"], {})
+    if "stores_zip" not in built:
+        perf = st.session_state["perf"]
+        start = len(perf.records)
+        built["stores_zip"] = stores_zip_bytes(st.session_state["stores"], st.session_state["ts"], perf)
+        if perf_log:
+            perf.write_jsonl(perf_log, start=start, run=st.session_state["ts"])
+    return built["stores_zip"]
+
+if st.session_state["stores"] is not None:
     ts = st.session_state["ts"]
+    stores = st.session_state["stores"]
+    st.subheader("Stores")
+    st.dataframe(pd.DataFrame([{"Store": name, "FULL rows": len(r.full_export_df), "Only-changed": len(r.pos_update_df),
+                                "Goal Sheet": len(r.gs1_df), "Unmatched": len(r.unmatched_df)} for name, r in stores.items()]),
+                 use_container_width=True)
+    if stores and ("stores_zip" in st.session_state["exports"].get(ts, {}) or st.button("Prepare all-stores zip")):
+        st.download_button("⬇️ All stores — ZIP (changed/full CSV + audit workbook per store)", data=stores_zip(),
+            file_name=f"stores_{ts}.zip", mime="application/zip", key="dl_stores_zip")
+    if stores:
+        r = stores[st.selectbox("Preview store", options=list(stores))]
+        st.subheader("Preview — FULL Export (first 200)")
+        st.dataframe(sanitize_columns(r.full_export_df).head(200), use_container_width=True)
+        st.subheader("Preview — Goal Sheet 1 (first 100)")
+        st.dataframe(sanitize_columns(r.gs1_df).head(100), use_container_width=True)
+        st.subheader("Unmatched (first 200)")
+        st.dataframe(sanitize_columns(r.unmatched_df).head(200), use_container_width=True)
+elif st.session_state["full_export_df"] is not None:
+    ts = st.session_state["ts"]
+    names = export_filenames(ts)
+    built = st.session_state["exports"].get(ts, {})
     c1, c2, c3 = st.columns(3)
     with c1:
-        st.download_button("⬇️ POS Update (only changed) — CSV",
-            data=df_to_csv_bytes(st.session_state["pos_update_df"]),
-            file_name=f"POS_Update_OnlyChanged_{ts}.csv", mime="text/csv", key="dl_changed_csv")
+        st.download_button("⬇️ POS Update (only changed) — CSV", data=export_bytes("changed_csv"),
+            file_name=names["changed_csv"], mime="text/csv", key="dl_changed_csv")
     with c2:
-        st.download_button("⬇️ FULL Export (all matched) — CSV",
-            data=df_to_csv_bytes(st.session_state["full_export_df"]),
-            file_name=f"POS_Full_AllItems_{ts}.csv", mime="text/csv", key="dl_full_csv")
+        st.download_button("⬇️ FULL Export (all matched) — CSV", data=export_bytes("full_csv"),
+            file_name=names["full_csv"], mime="text/csv", key="dl_full_csv")
     with c3:
-        st.download_button("⬇️ Audit Workbook (xlsx)",
-            data=dfs_to_xlsx_bytes({
-                "Changes Only": st.session_state["pos_update_df"],
-                "Goal Sheet 1": st.session_state["gs1_df"],
-                "Unmatched":    st.session_state["unmatched_df"],
-            }),
-            file_name=f"Unified_Audit_{ts}_with_GoalSheet1.xlsx",
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            key="dl_audit_xlsx")
+        if "audit_xlsx" in built or st.session_state["export_paths"] or st.button("Prepare Audit Workbook (xlsx)"):
+            st.download_button("⬇️ Audit Workbook (xlsx)", data=export_bytes("audit_xlsx"),
+                file_name=names["audit_xlsx"],
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                key="dl_audit_xlsx")
 
     st.subheader("Preview — FULL Export (first 200)")
     st.dataframe(sanitize_columns(st.session_state["full_export_df"]).head(200), use_container_width=True)
@@ -186,3 +244,10 @@ if st.session_state["full_export_df"] is not None:
     st.dataframe(sanitize_columns(st.session_state["unmatched_df"]).head(200), use_container_width=True)
 else:
     st.info("Upload a POS CSV and at least one invoice file, then click **Process**.")
+
+if show_perf and st.session_state["perf"] is not None:
+    with st.sidebar:
+        st.markdown("### Performance")
+        st.dataframe(st.session_state["perf"].summary(), use_container_width=True)
+        with st.expander("Per file"):
+            st.dataframe(st.session_state["perf"].frame(), use_container_width=True)
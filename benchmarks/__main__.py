@@ -0,0 +1,177 @@
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from parsers import LoadedInvoice, get_parser
+from parsers.base import ARROW_DTYPES
+from parsers.utils import to_arrow
+from pipeline import (
+    AUTO_DETECT, parse_invoices, build_invoice_index, match_pricebook, read_pos,
+    df_to_csv_bytes, dfs_to_xlsx_bytes, audit_sheets,
+)
+from pipeline.core import finish_goal_sheet, unmatched_lines
+from .synth import generate
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+PARSER_FILES = {"unified": get_parser("Unified (SVMERCH)"), "sg": get_parser("Southern Glazer's"), "nb": get_parser("Nevada Beverage")}
+
+# Wall time and (optionally) tracemalloc peak per named stage.
+class Stages:
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self.seconds, self.peak_bytes, self.rows = {}, {}, {}
+
+    @contextmanager
+    def __call__(self, name: str):
+        if self.trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        t = time.perf_counter()
+        yield
+        self.seconds[name] = time.perf_counter() - t
+        if self.trace:
+            self.peak_bytes[name] = tracemalloc.get_traced_memory()[1] - base
+
+def _load(path: Path) -> LoadedInvoice:
+    return LoadedInvoice(path.name, path.read_bytes())
+
+def run_once(paths: dict, stages: Stages, arrow: bool = False):
+    # process() split into its stages, plus each parser alone and the exports.
+    for vendor, parser in PARSER_FILES.items():
+        if vendor in paths:
+            with stages(f"parse:{vendor}"):
+                stages.rows[f"parse:{vendor}"] = len(parser.parse(_load(paths[vendor])))
+    invoices = [_load(paths[v]) for v in PARSER_FILES if v in paths]
+    with stages("parse_invoices"):
+        frames, errors = parse_invoices(invoices, AUTO_DETECT)
+    with stages("build_invoice_index"):
+        if arrow:
+            frames = [to_arrow(df, ARROW_DTYPES) for df in frames]
+        inv = build_invoice_index(frames)
+    with stages("read_pos"):
+        pos_df = read_pos(paths["pos"], arrow)
+    with stages("match_pricebook"):
+        full, changed, gs1_rows, inv_rows = match_pricebook(pos_df, inv)
+    with stages("finish_goal_sheet"):
+        gs1 = finish_goal_sheet(gs1_rows)
+    with stages("unmatched_lines"):
+        unmatched = unmatched_lines(inv, inv_rows)
+    with stages("export_csv"):
+        df_to_csv_bytes(changed), df_to_csv_bytes(full)
+    with stages("export_xlsx"):
+        dfs_to_xlsx_bytes(audit_sheets(changed, gs1, unmatched))
+    stages.rows.update({"parse_invoices": sum(map(len, frames)), "build_invoice_index": len(inv.lines),
+                        "read_pos": len(pos_df), "match_pricebook": len(full), "finish_goal_sheet": len(gs1),
+                        "unmatched_lines": len(unmatched)})
+    return errors
+
+def bench_case(paths: dict, repeat: int, memory: bool, arrow: bool = False) -> list:
+    # Best-of-`repeat` wall time per stage; peaks come from one extra traced run,
+    # since tracemalloc slows everything it watches.
+    runs = []
+    for _ in range(repeat):
+        stages = Stages()
+        errors = run_once(paths, stages, arrow)
+        runs.append(stages)
+    traced = None
+    if memory:
+        traced = Stages(trace=True)
+        tracemalloc.start()
+        try:
+            run_once(paths, traced, arrow)
+        finally:
+            tracemalloc.stop()
+    out = []
+    for name in runs[0].seconds:
+        out.append({
+            "stage": name,
+            "seconds": min(r.seconds[name] for r in runs),
+            "peak_mb": round(traced.peak_bytes[name] / 1024**2, 2) if traced else None,
+            "rows_out": runs[0].rows.get(name),
+        })
+    if errors:
+        print(f"  parse errors: {errors}", file=sys.stderr)
+    return out
+
+def cmd_run(args) -> int:
+    results = []
+    for n in args.rows:
+        for fmt in args.formats:
+            case = f"{fmt}-{n}"
+            paths = generate(args.data_dir, n, fmt, seed=args.seed)
+            print(f"{case}: {', '.join(p.name for p in paths.values())}", file=sys.stderr)
+            for row in bench_case(paths, args.repeat, not args.no_memory, args.arrow):
+                results.append({"case": case, **row})
+                print(f"  {row['stage']:<20} {row['seconds']:9.3f}s  peak {row['peak_mb']} MB", file=sys.stderr)
+    doc = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(), "pandas": pd.__version__, "numpy": np.__version__,
+            "platform": platform.platform(), "repeat": args.repeat, "seed": args.seed, "arrow": args.arrow,
+        },
+        "results": results,
+    }
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(doc, indent=1), encoding="utf-8")
+    print(f"wrote {out}", file=sys.stderr)
+    return 0
+
+def cmd_compare(args) -> int:
+    # Exit status 1 when any stage got slower (or hungrier) than --threshold allows.
+    base, cur = (json.loads(Path(p).read_text(encoding="utf-8"))["results"] for p in (args.baseline, args.current))
+    base = {(r["case"], r["stage"]): r for r in base}
+    regressions = 0
+    print(f"{'case':<14} {'stage':<20} {'base s':>9} {'now s':>9} {'ratio':>6} {'base MB':>8} {'now MB':>8}")
+    for r in cur:
+        b = base.get((r["case"], r["stage"]))
+        if b is None:
+            continue
+        ratio = r["seconds"] / b["seconds"] if b["seconds"] else float("inf")
+        slow = ratio > 1 + args.threshold and r["seconds"] - b["seconds"] > args.min_seconds
+        fat = (r["peak_mb"] is not None and b["peak_mb"] is not None
+               and r["peak_mb"] > b["peak_mb"] * (1 + args.threshold) and r["peak_mb"] - b["peak_mb"] > 1)
+        regressions += slow or fat
+        flag = "  REGRESSION" if slow or fat else ""
+        print(f"{r['case']:<14} {r['stage']:<20} {b['seconds']:9.3f} {r['seconds']:9.3f} {ratio:6.2f} "
+              f"{b['peak_mb'] if b['peak_mb'] is not None else '-':>8} {r['peak_mb'] if r['peak_mb'] is not None else '-':>8}{flag}")
+    print(f"{regressions} regression(s)")
+    return 1 if regressions else 0
+
+def _positive_int(text: str) -> int:
+    n = int(text)
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {n}")
+    return n
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the invoice → POS pipeline on synthetic data.")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    run = sub.add_parser("run", help="generate inputs (cached) and time every stage")
+    run.add_argument("--rows", type=int, nargs="+", default=SIZES[:3], help="invoice lines / pricebook items per case (default: %(default)s)")
+    run.add_argument("--formats", nargs="+", choices=["csv", "xlsx"], default=["csv", "xlsx"])
+    run.add_argument("--repeat", type=_positive_int, default=3, help="timed runs per case; the fastest counts")
+    run.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run")
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--arrow", action="store_true", help="Arrow-backed frames (tracemalloc peaks don't see Arrow buffers)")
+    run.add_argument("--data-dir", default="benchmarks/data", help="where generated inputs are kept")
+    run.add_argument("--out", default=f"benchmarks/results/{datetime.now():%Y%m%d_%H%M%S}.json")
+    cmp = sub.add_parser("compare", help="diff two result files")
+    cmp.add_argument("baseline")
+    cmp.add_argument("current")
+    cmp.add_argument("--threshold", type=float, default=0.10, help="allowed relative slowdown (default: %(default)s)")
+    cmp.add_argument("--min-seconds", type=float, default=0.01, help="ignore slowdowns smaller than this")
+    args = ap.parse_args(argv)
+    return cmd_run(args) if args.cmd == "run" else cmd_compare(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from parsers.utils import normalize_invoice_upc_series
+from pipeline.xlsx_stream import XlsxStreamWriter
+
+EXCEL_MAX_ROWS = 1_048_576
+
+# Synthetic inputs shaped like the real files each parser reads. `n` is the number of
+# invoice lines (SG writes three sheet rows per line); the POS pricebook has `n` items,
+# and invoices draw `overlap` of their UPCs from it.
+
+def _s(values) -> pd.Series:
+    return pd.Series(values).astype(str)
+
+def upc11(rng, n: int) -> pd.Series:
+    return _s(rng.integers(10**9, 10**11, n)).str.zfill(11)
+
+def _dates(rng, n: int) -> pd.Series:
+    days = rng.integers(0, 365, n).astype("timedelta64[D]")
+    return pd.Series(np.datetime64("2024-01-01") + days)
+
+def _money(rng, n: int, lo: float, hi: float) -> pd.Series:
+    return pd.Series(rng.uniform(lo, hi, n)).map("{:.2f}".format)
+
+def _invoice_upcs(rng, pos_upcs: pd.Series, n: int, overlap: float) -> pd.Series:
+    known = pos_upcs.to_numpy()[rng.integers(0, len(pos_upcs), n)]
+    fresh = upc11(rng, n).to_numpy()
+    return pd.Series(np.where(rng.random(n) < overlap, known, fresh))
+
+def pos_frame(rng, upcs: pd.Series) -> pd.DataFrame:
+    n = len(upcs)
+    full = normalize_invoice_upc_series(upcs)
+    form = rng.integers(0, 4, n)
+    upc = np.select([form == 0, form == 1, form == 2], [full, upcs, full.str[1:]], "0" + full)
+    cents = _s(rng.integers(100, 9000, n)).where(rng.random(n) < 0.9, "")
+    return pd.DataFrame({
+        "Upc": upc,
+        "name": "Item " + _s(np.arange(n)),
+        "cost_qty": _s(rng.choice([1, 6, 12, 24], n)),
+        "cost_cents": _s(rng.integers(100, 5000, n)),
+        "cents": cents,
+    })
+
+def unified_frame(rng, upcs: pd.Series) -> pd.DataFrame:
+    n = len(upcs)
+    head = pd.DataFrame([["Unified Grocers Statement"] + [""] * 8, [""] * 9,
+                         ["Invoice Date", "Item UPC", "Brand", "Description", "Pack", "Size", "Cost", "Net Case Cost", "Case Qty"]])
+    body = pd.DataFrame({
+        0: _dates(rng, n).dt.strftime("%Y-%m-%d"),
+        1: upcs.where(rng.random(n) < 0.5, "0-" + upcs),
+        2: "BR" + _s(rng.integers(0, 500, n)),
+        3: "Desc " + _s(np.arange(n)),
+        4: _s(rng.choice([6, 12, 24], n)),
+        5: pd.Series(rng.choice(["12 OZ", "750 ML", "1 L"], n)),
+        6: _money(rng, n, 5, 50),
+        7: _money(rng, n, 5, 50),
+        8: pd.Series(rng.choice(["0", "1", "2 CS", "", "3"], n)),
+    })
+    return pd.concat([head, body], ignore_index=True)
+
+def sg_frame(rng, upcs: pd.Series) -> pd.DataFrame:
+    n = len(upcs)
+    item = pd.DataFrame({0: "ITEM# " + _s(100000 + np.arange(n)), 1: "Product name " + _s(np.arange(n)), 2: ""})
+    upc = pd.DataFrame({0: "UPC: " + upcs.str[:5] + "-" + upcs.str[5:], 1: "",
+                        2: "SIZE: " + pd.Series(rng.choice(["750 Z", "1.75 L", "375 Z"], n))})
+    cs = _s(rng.integers(1, 6, n))
+    net = pd.DataFrame({0: "Unit Net Amount: $" + _money(rng, n, 5, 200), 1: "CS ORD/DLV: " + cs + "/" + cs, 2: ""})
+    body = pd.concat([item, upc, net], keys=range(3)).swaplevel().sort_index(level=0, sort_remaining=True)
+    # An invoice date line inside every 50th item block.
+    dates = pd.DataFrame({0: "Invoice Date: " + _dates(rng, (n + 49) // 50).dt.strftime("%m/%d/%Y"), 1: "", 2: ""})
+    dates.index = pd.MultiIndex.from_arrays([np.arange(0, n, 50), np.full(len(dates), 3)])
+    body = pd.concat([body, dates]).sort_index()
+    head = pd.DataFrame([["Southern Glazer's Wine and Spirits", "", ""], ["ITEM#", "UPC", "Unit Net Amount"]])
+    return pd.concat([head, body.reset_index(drop=True)], ignore_index=True)
+
+def nb_frame(rng, upcs: pd.Series) -> pd.DataFrame:
+    n = len(upcs)
+    date = (" Invoice Date: " + _dates(rng, n).dt.strftime("%m/%d/%Y")).where(rng.random(n) < 0.5, "")
+    body = pd.DataFrame({
+        0: "ITEM# " + _s(200000 + np.arange(n)) + " Beer thing " + _s(np.arange(n)),
+        1: "U.P.C. " + upcs,
+        2: "$" + _money(rng, n, 5, 99) + date,
+    })
+    head = pd.DataFrame([["Nevada Beverage Co", "", ""], ["ITEM#", "U.P.C.", "QTY DESCRIPTION"]])
+    tail = pd.DataFrame([["TOTAL", "", ""]])
+    return pd.concat([head, body, tail], ignore_index=True)
+
+INVOICES = {"unified": unified_frame, "sg": sg_frame, "nb": nb_frame}
+
+def write_grid(df: pd.DataFrame, path: Path, header: bool = False):
+    if path.suffix == ".xlsx":
+        with XlsxStreamWriter(path) as xlsx:
+            xlsx.add_sheet("Sheet1", df.columns, header=header)
+            xlsx.append("Sheet1", df)
+    else:
+        df.to_csv(path, header=header, index=False)
+
+def generate(out_dir, n: int, fmt: str = "csv", seed: int = 0, overlap: float = 0.8) -> dict:
+    # Writes pos.csv plus one invoice per vendor as <vendor>.<fmt>; returns their paths.
+    # Existing files are reused. Invoices that would pass Excel's row limit are skipped.
+    out_dir = Path(out_dir) / f"n{n}-s{seed}"
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    pos_upcs = upc11(rng, n)
+    paths = {"pos": out_dir / "pos.csv"}
+    if not paths["pos"].exists():
+        write_grid(pos_frame(rng, pos_upcs), paths["pos"], header=True)
+    for i, (vendor, make) in enumerate(INVOICES.items(), 1):
+        path = out_dir / f"{vendor}.{fmt}"
+        vendor_rng = np.random.default_rng([seed, i])
+        if not path.exists():
+            grid = make(vendor_rng, _invoice_upcs(vendor_rng, pos_upcs, n, overlap))
+            if fmt == "xlsx" and len(grid) > EXCEL_MAX_ROWS:
+                continue
+            write_grid(grid, path)
+        paths[vendor] = path
+    return paths
@@ -1,6 +1,10 @@
 
+from .loaded_invoice import LoadedInvoice
 from .unified_parser import UnifiedParser
 from .southern_glazers import SouthernGlazersParser
 from .nevada_beverage import NevadaBeverageParser
 
 ALL_PARSERS = [UnifiedParser(), SouthernGlazersParser(), NevadaBeverageParser()]
+
+def get_parser(name: str):
+    return next(p for p in ALL_PARSERS if p.name == name)
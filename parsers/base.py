@@ -3,11 +3,23 @@ from abc import ABC, abstractmethod
 import pandas as pd
 
 STANDARD_COLS = ["invoice_date","UPC","Brand","Description","Pack","Size","Cost","+Cost","Case Qty"]
+VENDOR_COL = "invoice_vendor"  # parser name per line; added by the invoice index, not the parsers
+# STANDARD_COLS as Arrow-backed dtypes (one fixed schema, so frames concat without widening).
+ARROW_DTYPES = {
+    "invoice_date": "date32[pyarrow]", "UPC": "string[pyarrow]", "Brand": "string[pyarrow]",
+    "Description": "string[pyarrow]", "Pack": "double[pyarrow]", "Size": "string[pyarrow]",
+    "Cost": "double[pyarrow]", "+Cost": "double[pyarrow]", "Case Qty": "int64[pyarrow]",
+}
 
 class InvoiceParser(ABC):
     name: str = "base"
+    version: str = "1"  # bump when parse() output changes; keys the invoice cache
     tokens: list[str] = []
 
     @abstractmethod
     def parse(self, uploaded_file) -> pd.DataFrame:
         raise NotImplementedError
+
+    # PDF invoices: an iterable of per-page text lines (see parsers.pdf.iter_pages).
+    def parse_pages(self, pages) -> pd.DataFrame:
+        raise NotImplementedError(f"{self.name} doesn't read PDF invoices")
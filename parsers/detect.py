@@ -0,0 +1,111 @@
+import hashlib
+import html
+import re
+import zipfile
+from collections import OrderedDict
+from io import BytesIO
+from typing import NamedTuple
+
+from .loaded_invoice import LoadedInvoice
+from .pdf import extract_pages
+
+PREFIX_BYTES = 64 * 1024
+HEAD_LINES = 50
+XML_TEXT_RE = re.compile(rb"<(?:t|v)(?:\s[^>]*)?>([^<]*)</(?:t|v)>")
+DIGITS_RE = re.compile(r"\d+")
+MIN_CONFIDENCE = 0.4  # below this a lead is too thin to route on (3 hits vs 2 is 0.33)
+
+class Detection(NamedTuple):
+    parser: object      # best-scoring parser; None when nothing matched
+    confidence: float   # 0..1: share of the winner's token hits the runner-up doesn't have
+    ambiguous: bool     # no tokens matched, or confidence under the Fingerprinter's minimum
+    hits: dict          # parser name -> distinct tokens found
+
+def _xlsx_text(data: bytes) -> str:
+    # Strings from the shared-strings table and the first sheet, read only up to
+    # PREFIX_BYTES of each decompressed part.
+    with zipfile.ZipFile(BytesIO(data)) as zf:
+        names = set(zf.namelist())
+        sheets = sorted(n for n in names if n.startswith("xl/worksheets/") and n.endswith(".xml"))
+        parts = [n for n in ["xl/sharedStrings.xml", "xl/worksheets/sheet1.xml"] if n in names] or sheets[:1]
+        chunks = []
+        for name in parts:
+            with zf.open(name) as fh:
+                chunks.extend(XML_TEXT_RE.findall(fh.read(PREFIX_BYTES)))
+    return html.unescape(b"\n".join(chunks).decode("utf-8", errors="replace"))
+
+def detection_text(inv: LoadedInvoice) -> str:
+    # A small raw prefix to fingerprint: the first HEAD_LINES lines of a CSV, the
+    # sheet strings of an .xlsx, the first page of a PDF; anything else (.xls) goes
+    # through pandas.
+    if inv.is_pdf:
+        return "\n".join(extract_pages(inv.data, 0, 1)[0][:HEAD_LINES]) if inv.data else ""
+    if inv.is_csv:
+        head = inv.data[:PREFIX_BYTES]
+        cut = -1
+        for _ in range(HEAD_LINES):
+            cut = head.find(b"\n", cut + 1)
+            if cut < 0:
+                break
+        return head[:cut if cut >= 0 else len(head)].decode("utf-8", errors="replace")
+    if inv.data[:2] == b"PK":
+        try:
+            return _xlsx_text(inv.data)
+        except (zipfile.BadZipFile, KeyError):
+            pass
+    return inv.head_text(HEAD_LINES)
+
+def structure_signature(text: str) -> str:
+    # Same layout + labels, different numbers/dates => same signature.
+    return hashlib.sha1(DIGITS_RE.sub("0", text[:4096].lower()).encode("utf-8")).hexdigest()
+
+# All tokens of all parsers in one case-insensitive regex. The lookahead makes every
+# position a match start, so overlapping tokens are all seen; longest-first order plus
+# `implied` credits tokens that are prefixes of the one that matched.
+class Fingerprinter:
+    def __init__(self, parsers, min_confidence: float = MIN_CONFIDENCE):
+        self.parsers = list(parsers)
+        self.min_confidence = min_confidence
+        tokens = sorted({t.lower() for p in self.parsers for t in p.tokens}, key=lambda t: (-len(t), t))
+        self.pattern = re.compile("(?=(" + "|".join(map(re.escape, tokens)) + "))")
+        self.implied = {t: [u for u in tokens if t.startswith(u)] for t in tokens}
+        self.owners = {t: [p.name for p in self.parsers if t in {x.lower() for x in p.tokens}] for t in tokens}
+
+    def hits(self, text: str) -> dict:
+        found = set()
+        for tok in set(self.pattern.findall(text.lower())):
+            found.update(self.implied[tok])
+        counts = {p.name: 0 for p in self.parsers}
+        for tok in found:
+            for name in self.owners[tok]:
+                counts[name] += 1
+        return counts
+
+    def detect(self, text: str) -> Detection:
+        counts = self.hits(text)
+        ranked = sorted(self.parsers, key=lambda p: -counts[p.name])  # stable: ties keep list order
+        best = ranked[0]
+        top = counts[best.name]
+        second = counts[ranked[1].name] if len(ranked) > 1 else 0
+        if top == 0:
+            return Detection(None, 0.0, True, counts)
+        confidence = (top - second) / top
+        return Detection(best, confidence, top == second or confidence < self.min_confidence, counts)
+
+class DetectionCache:
+    # In-process decisions keyed by structure_signature(), most recent kept.
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get(self, signature: str):
+        det = self.entries.get(signature)
+        if det is not None:
+            self.entries.move_to_end(signature)
+        return det
+
+    def put(self, signature: str, det: Detection):
+        self.entries[signature] = det
+        self.entries.move_to_end(signature)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
@@ -0,0 +1,52 @@
+import hashlib
+from io import BytesIO
+
+import pandas as pd
+
+# An uploaded invoice read into memory once. Detection and parsing share the raw
+# header-less string grid instead of each re-reading the workbook.
+class LoadedInvoice:
+    def __init__(self, name: str, data: bytes):
+        self.name = name
+        self.data = data
+        self._grid = None
+        self._digest = None
+
+    @classmethod
+    def load(cls, file) -> "LoadedInvoice":
+        if isinstance(file, LoadedInvoice):
+            return file
+        return cls(getattr(file, "name", ""), file.read())
+
+    @property
+    def is_csv(self) -> bool:
+        return self.name.lower().endswith(".csv")
+
+    @property
+    def is_pdf(self) -> bool:
+        return self.name.lower().endswith(".pdf") or self.data[:5] == b"%PDF-"
+
+    @property
+    def digest(self) -> str:
+        if self._digest is None:
+            self._digest = hashlib.sha256(self.data).hexdigest()
+        return self._digest
+
+    @property
+    def decoded(self) -> bool:
+        return self._grid is not None
+
+    @property
+    def grid(self) -> pd.DataFrame:
+        # Same frame as read_csv/read_excel(header=None, dtype=str); pandas opens .xlsx
+        # with openpyxl in read-only (streaming) mode.
+        if self._grid is None:
+            if self.is_csv:
+                self._grid = pd.read_csv(BytesIO(self.data), header=None, dtype=str, keep_default_na=False)
+            else:
+                self._grid = pd.read_excel(BytesIO(self.data), header=None, dtype=str)
+        return self._grid
+
+    def head_text(self, nrows: int = 50) -> str:
+        head = self.grid.head(nrows)
+        return "\n".join(" ".join([str(x) for x in row]) for row in head.itertuples(index=False))
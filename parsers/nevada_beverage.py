@@ -1,55 +1,83 @@
-
 import pandas as pd
 import numpy as np
 import re
-from .utils import normalize_invoice_upc, sanitize_columns
+from .base import InvoiceParser
+from .loaded_invoice import LoadedInvoice
+from .pdf import iter_pages
+from .utils import normalize_invoice_upc_series, sanitize_columns, row_lines, extract_if, first_match
+
+STOP_RE  = re.compile(r"TOTAL|PAYMENT|SUMMARY", re.I)
+UPC_RE   = re.compile(r"(?:UPC|U\.P\.C\.)[:\s]*([0-9\- ]+)", re.I)
+DESC_RE  = re.compile(r"ITEM#\s*\S+\s+(.+)")
+COST_RE  = re.compile(r"\$([0-9\.,]+)")
+DATE_RE  = re.compile(r"Invoice Date[:\s]*([0-9/\\-]+)", re.I)
 
-class NevadaBeverageParser:
+class NevadaBeverageParser(InvoiceParser):
     name = "Nevada Beverage"
+    version = "2"
     tokens = ["ITEM#","U.P.C.","QTY","DESCRIPTION"]
 
     def parse(self, uploaded_file) -> pd.DataFrame:
-        if uploaded_file.name.lower().endswith(".csv"):
-            df_raw = pd.read_csv(uploaded_file, header=None, dtype=str, keep_default_na=False)
-        else:
-            df_raw = pd.read_excel(uploaded_file, header=None, dtype=str)
-
-        header_row = None
-        for i in range(min(100, len(df_raw))):
-            row = " ".join([str(x) for x in df_raw.iloc[i].tolist()])
-            if "ITEM#" in row.upper() and ("U.P.C." in row.upper() or "UPC" in row.upper()):
-                header_row = i
-                break
-        if header_row is None:
-            header_row = 0
+        inv = LoadedInvoice.load(uploaded_file)
+        if inv.is_pdf:
+            return self.parse_pages(iter_pages(inv))
+        lines = row_lines(inv.grid)
+        return self.parse_lines(lines.iloc[self.header_end(lines):])
+
+    def _header_rows(self, lines: pd.Series) -> pd.Series:
+        up = lines.head(100).str.upper()
+        return up.str.contains("ITEM#", regex=False) & (up.str.contains("U.P.C.", regex=False) | up.str.contains("UPC", regex=False))
 
-        df = df_raw.iloc[header_row+1:].fillna("")
-        lines = df.apply(lambda r: " ".join([str(x) for x in r.tolist() if str(x).strip()!=""]), axis=1).tolist()
+    def header_end(self, lines: pd.Series) -> int:
+        return first_match(self._header_rows(lines)) + 1
 
-        items = []
-        for ln in lines:
-            if re.search(r"TOTAL|PAYMENT|SUMMARY", ln, re.I):
+    def parse_pages(self, pages) -> pd.DataFrame:
+        # Lines stand alone, so each page is parsed as it arrives, and extraction
+        # stops at the page with the TOTAL/PAYMENT/SUMMARY line. Pages are buffered
+        # until the header is found or 100 lines (header_end's window) have passed,
+        # so a cover page before the header isn't read as items.
+        parts, buf, started = [], [], False
+        for page in pages:
+            if started:
+                lines = pd.Series(page, dtype=object)
+            else:
+                buf.extend(page)
+                lines = pd.Series(buf, dtype=object)
+                if len(buf) < 100 and not self._header_rows(lines).any():
+                    continue
+                lines, buf, started = lines.iloc[self.header_end(lines):], [], True
+            parts.append(self.parse_lines(lines))
+            if lines.str.contains(STOP_RE).any():
                 break
-            m_upc = re.search(r"(?:UPC|U\.P\.C\.)[:\s]*([0-9\- ]+)", ln, re.I)
-            m_desc = re.search(r"ITEM#\s*\S+\s+(.+)", ln)
-            m_cost = re.search(r"\$([0-9\.,]+)", ln)
-            m_date = re.search(r"Invoice Date[:\s]*([0-9/\\-]+)", ln, re.I)
-            if m_upc:
-                upc = normalize_invoice_upc(m_upc.group(1))
-                desc = m_desc.group(1).strip() if m_desc else ""
-                cost = float(m_cost.group(1).replace(",","")) if m_cost else np.nan
-                items.append({
-                    "invoice_date": m_date.group(1) if m_date else None,
-                    "UPC": upc, "Brand":"", "Description": desc,
-                    "Pack": np.nan, "Size":"",
-                    "Cost": cost, "+Cost": cost,
-                    "Case Qty": pd.NA
-                })
-
-        out = pd.DataFrame(items)
+        if not started:
+            lines = pd.Series(buf, dtype=object)
+            parts.append(self.parse_lines(lines.iloc[self.header_end(lines):]))
+        # Re-normalise columns concat may have widened (all-NA parts).
+        out = pd.concat(parts, ignore_index=True)
+        out["invoice_date"] = pd.to_datetime(out["invoice_date"], errors="coerce").dt.date
+        out["Case Qty"] = pd.Series(pd.NA, index=out.index, dtype=object)
+        return out
+
+    def parse_lines(self, lines: pd.Series) -> pd.DataFrame:
+        lines = lines.reset_index(drop=True)
+        stop = first_match(lines.str.contains(STOP_RE), default=len(lines))
+        lines = lines.iloc[:stop]
+
+        upc = lines.str.extract(UPC_RE, expand=False)
+        keep = upc.notna()
+        lines, upc = lines[keep], upc[keep]
+        up = lines.str.upper()
+        cost = pd.to_numeric(lines.str.extract(COST_RE, expand=False).str.replace(",", "", regex=False), errors="coerce")
+
+        out = pd.DataFrame({
+            "invoice_date": extract_if(lines, up, "INVOICE DATE", DATE_RE),
+            "UPC": normalize_invoice_upc_series(upc),
+            "Brand": "",
+            "Description": lines.str.extract(DESC_RE, expand=False).str.strip().fillna(""),
+            "Pack": np.nan, "Size": "",
+            "Cost": cost.astype("float64"), "+Cost": cost.astype("float64"),
+            "Case Qty": pd.Series(pd.NA, index=lines.index, dtype=object),
+        }).reset_index(drop=True)
         out["invoice_date"] = pd.to_datetime(out["invoice_date"], errors="coerce").dt.date
         cols = ["invoice_date","UPC","Brand","Description","Pack","Size","Cost","+Cost","Case Qty"]
-        for c in cols:
-            if c not in out.columns:
-                out[c] = "" if c in ["Brand","Description","Size"] else pd.NA
         return sanitize_columns(out[cols])
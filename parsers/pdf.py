@@ -0,0 +1,90 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from .loaded_invoice import LoadedInvoice
+
+PAGES_PER_TASK = 8
+
+# PDF text via pdfplumber (imported lazily: only PDF uploads need it). Pages come
+# out as lists of text lines, in order, a few tasks at a time, so a long statement
+# is never held in memory whole.
+
+def _open(data: bytes):
+    import pdfplumber
+    return pdfplumber.open(BytesIO(data))
+
+def page_count(data: bytes) -> int:
+    with _open(data) as pdf:
+        return len(pdf.pages)
+
+def _page_lines(pdf, first: int, last: int) -> list:
+    out = []
+    for page in pdf.pages[first:last]:
+        out.append((page.extract_text() or "").splitlines())
+        page.flush_cache()
+    return out
+
+def extract_pages(data: bytes, first: int, last: int) -> list:
+    # Text lines of pages [first, last).
+    with _open(data) as pdf:
+        return _page_lines(pdf, first, last)
+
+_WORKER_PDF = None
+
+def _open_shared(data: bytes):
+    # Pool initializer: each worker gets the file once and keeps it open for all
+    # of its tasks, instead of every task shipping and re-opening the whole PDF.
+    global _WORKER_PDF
+    _WORKER_PDF = _open(data)
+
+def _extract_shared(first: int, last: int) -> list:
+    return _page_lines(_WORKER_PDF, first, last)
+
+def iter_pages(file, workers: int = 1, cache=None):
+    # Yields each page's lines in order. With workers > 1 pages are extracted on a
+    # process pool, at most 2 * workers tasks ahead of the consumer. `cache` is an
+    # InvoiceCache-like object with page_lines/put_page_lines keyed by content hash.
+    inv = LoadedInvoice.load(file)
+    n = page_count(inv.data)
+    ranges = deque((i, min(i + PAGES_PER_TASK, n)) for i in range(0, n, PAGES_PER_TASK))
+    ex = (ProcessPoolExecutor(max_workers=workers, initializer=_open_shared, initargs=(inv.data,))
+          if workers > 1 and len(ranges) > 1 else None)
+    pending = deque()
+    local = []  # the document, opened once, when pages are extracted in this process
+
+    def submit():
+        first, last = ranges.popleft()
+        if cache is not None:
+            cached = [cache.page_lines(inv.digest, i) for i in range(first, last)]
+            if all(p is not None for p in cached):
+                pending.append((first, None, cached))
+                return
+        if ex is not None:
+            pending.append((first, ex.submit(_extract_shared, first, last), None))
+        else:
+            if not local:
+                local.append(_open(inv.data))
+            pending.append((first, None, _page_lines(local[0], first, last)))
+            if cache is not None:
+                remember(first, pending[-1][2])
+
+    def remember(first, pages):
+        for i, lines in enumerate(pages, first):
+            cache.put_page_lines(inv.digest, i, lines)
+
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < (2 * workers if ex else 1):
+                submit()
+            first, fut, pages = pending.popleft()
+            if fut is not None:
+                pages = fut.result()
+                if cache is not None:
+                    remember(first, pages)
+            yield from pages
+    finally:
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
+        for pdf in local:
+            pdf.close()
@@ -1,71 +1,97 @@
-
 import pandas as pd
-import numpy as np
 import re
-from .utils import find_col, first_int_from_text, to_float, normalize_invoice_upc, sanitize_columns, digits_only
+from .base import InvoiceParser
+from .loaded_invoice import LoadedInvoice
+from .pdf import iter_pages
+from .utils import normalize_invoice_upc_series, sanitize_columns, row_lines, extract_if, first_match, last_per_group
+
+UPC_RE       = re.compile(r"\bUPC[:\s]*([0-9\- ]+)", re.I)
+SIZE_RE      = re.compile(r"\bSIZE[:\s]*([A-Za-z0-9 ]+)", re.I)
+UNIT_NET_RE  = re.compile(r"Unit Net Amount[:\s]*\$?([0-9\.,]+)", re.I)
+CS_RE        = re.compile(r"CS ORD/DLV[:\s]*([0-9]+)(?:/[0-9]+)?", re.I)
+DATE_RE      = re.compile(r"Invoice Date[:\s]*([0-9/\\-]+)", re.I)
+DESC_RE      = re.compile(r"ITEM#.*?\s([A-Za-z0-9].+)")
 
-class SouthernGlazersParser:
+class SouthernGlazersParser(InvoiceParser):
     name = "Southern Glazer's"
+    version = "2"
     tokens = ["ITEM#","UPC","SIZE:","Unit Net Amount","CS ORD/DLV","Invoice"]
 
     def parse(self, uploaded_file) -> pd.DataFrame:
-        if uploaded_file.name.lower().endswith(".csv"):
-            df_raw = pd.read_csv(uploaded_file, header=None, dtype=str, keep_default_na=False)
-        else:
-            df_raw = pd.read_excel(uploaded_file, header=None, dtype=str)
-
-        header_row = None
-        for i in range(min(80, len(df_raw))):
-            row = " ".join([str(x) for x in df_raw.iloc[i].tolist()])
-            if "ITEM#" in row.upper() and "UPC" in row.upper():
-                header_row = i
-                break
-        if header_row is None:
-            header_row = 0
-
-        df = df_raw.iloc[header_row+1:].fillna("")
-        lines = df.apply(lambda r: " ".join([str(x) for x in r.tolist() if str(x).strip()!=""]), axis=1).tolist()
+        inv = LoadedInvoice.load(uploaded_file)
+        if inv.is_pdf:
+            return self.parse_pages(iter_pages(inv))
+        lines = row_lines(inv.grid)
+        return self.parse_lines(lines.iloc[self.header_end(lines):])
 
-        items = []
-        current = {}
-        for ln in lines:
-            upc_match = re.search(r"\bUPC[:\s]*([0-9\- ]+)", ln, re.I)
-            size_match = re.search(r"\bSIZE[:\s]*([A-Za-z0-9 ]+)", ln, re.I)
-            unit_net_match = re.search(r"Unit Net Amount[:\s]*\$?([0-9\.,]+)", ln, re.I)
-            cs_match = re.search(r"CS ORD/DLV[:\s]*([0-9]+(?:/[0-9]+)?)", ln, re.I)
-            date_match = re.search(r"Invoice Date[:\s]*([0-9/\\-]+)", ln, re.I)
+    def header_end(self, lines: pd.Series) -> int:
+        up = lines.head(80).str.upper()
+        return first_match(up.str.contains("ITEM#", regex=False) & up.str.contains("UPC", regex=False)) + 1
 
-            if "ITEM#" in ln.upper():
-                if current.get("UPC"):
-                    items.append(current)
-                current = {"Size":"", "Brand":"", "Description":""}
+    def parse_pages(self, pages) -> pd.DataFrame:
+        # Lines are buffered only until the next ITEM# closes a block: everything before
+        # the buffer's last marker is parsed, the still-open block carries to the next page.
+        parts, buf, started = [], [], False
+        for page in pages:
+            buf.extend(page)
+            if not started:
+                if len(buf) < 80:
+                    continue
+                buf, started = buf[self.header_end(pd.Series(buf, dtype=object)):], True
+            markers = [i for i, line in enumerate(buf) if "ITEM#" in line.upper()]
+            if len(markers) > 1:
+                parts.append(self.parse_lines(pd.Series(buf[:markers[-1]], dtype=object)))
+                buf = buf[markers[-1]:]
+        if not started:
+            buf = buf[self.header_end(pd.Series(buf, dtype=object)):]
+        parts.append(self.parse_lines(pd.Series(buf, dtype=object)))
+        # Re-normalise columns concat may have widened (all-NA parts).
+        out = pd.concat(parts, ignore_index=True)
+        out["invoice_date"] = pd.to_datetime(out["invoice_date"], errors="coerce").dt.date
+        pack = pd.to_numeric(out["Pack"], errors="coerce")
+        if pack.notna().any():
+            out["Pack"] = pack.astype("int64") if pack.notna().all() else pack
+        return out
 
-            if upc_match:
-                upc_raw = re.sub(r"[^0-9]", "", upc_match.group(1))
-                current["UPC"] = normalize_invoice_upc(upc_raw)
-            if size_match:
-                sz = size_match.group(1).strip().replace(" z", " oz").replace("Z", "oz")
-                current["Size"] = sz
-            if unit_net_match:
-                try: current["Cost"] = float(unit_net_match.group(1).replace(",",""))
-                except: current["Cost"] = np.nan
-            if cs_match:
-                current["Pack"] = first_int_from_text(cs_match.group(1))
-            if date_match and "invoice_date" not in current:
-                current["invoice_date"] = date_match.group(1)
+    def parse_lines(self, lines: pd.Series) -> pd.DataFrame:
+        # Each "ITEM#" line opens a block; the lines before the first one form block 0.
+        lines = lines.reset_index(drop=True)
+        up = lines.str.upper()
+        marker = up.str.contains("ITEM#", regex=False)
+        block = marker.cumsum()
 
-            if not current.get("Description"):
-                mdesc = re.search(r"ITEM#.*?\s([A-Za-z0-9].+)", ln)
-                if mdesc: current["Description"] = mdesc.group(1).strip()
+        upc = extract_if(lines, up, "UPC", UPC_RE)
+        size = extract_if(lines, up, "SIZE", SIZE_RE)
+        unit_net = extract_if(lines, up, "UNIT NET AMOUNT", UNIT_NET_RE)
+        cs = extract_if(lines, up, "CS ORD/DLV", CS_RE)
+        date = extract_if(lines, up, "INVOICE DATE", DATE_RE)
+        desc = lines[marker].str.extract(DESC_RE, expand=False).str.strip()
 
-        if current.get("UPC"):
-            items.append(current)
+        # Later lines of a block overwrite UPC/size/cost/pack; the first date sticks.
+        upc = last_per_group(upc.str.replace(r"[^0-9]", "", regex=True), block)
+        blocks = upc.index
+        out = pd.DataFrame(index=blocks)
+        out["UPC"] = normalize_invoice_upc_series(upc)
+        out["Size"] = last_per_group(
+            size.str.strip().str.replace(" z", " oz", regex=False).str.replace("Z", "oz", regex=False), block
+        ).reindex(blocks)
+        out["Cost"] = last_per_group(pd.to_numeric(unit_net.str.replace(",", "", regex=False), errors="coerce"),
+                                     block, unit_net.notna()).reindex(blocks)
+        pack = last_per_group(pd.to_numeric(cs, errors="coerce"), block).reindex(blocks)
+        if pack.notna().any():
+            out["Pack"] = pack.astype("int64") if pack.notna().all() else pack
+        out["invoice_date"] = last_per_group(date, block, keep="first").reindex(blocks)
+        out["Description"] = pd.Series(desc.fillna("").to_numpy(), index=block[marker].to_numpy()).reindex(blocks)
+        # Blocks opened by ITEM# start with Size/Brand/Description = ""; block 0 only
+        # keeps what its own lines matched (blank when it's the only item).
+        defaults = (blocks > 0) | (len(blocks) == 1)
+        out["Brand"] = pd.Series("", index=blocks).where(defaults)
+        out.loc[defaults, ["Size","Description"]] = out.loc[defaults, ["Size","Description"]].fillna("")
+        out = out.reset_index(drop=True)
 
-        out = pd.DataFrame(items)
         out["+Cost"] = out["Cost"]
-        out["invoice_date"] = pd.to_datetime(out.get("invoice_date"), errors="coerce").dt.date
+        out["invoice_date"] = pd.to_datetime(out["invoice_date"], errors="coerce").dt.date
         out["Case Qty"] = pd.Series([pd.NA]*len(out), dtype="Int64")
-        out["Brand"] = out.get("Brand","")
         cols = ["invoice_date","UPC","Brand","Description","Pack","Size","Cost","+Cost","Case Qty"]
         for c in cols:
             if c not in out.columns:
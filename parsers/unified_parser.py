@@ -1,19 +1,17 @@
 
 import pandas as pd
 import numpy as np
-import re
-from .utils import find_col, first_int_from_text, to_float, normalize_invoice_upc, sanitize_columns
+from .base import InvoiceParser
+from .loaded_invoice import LoadedInvoice
+from .utils import find_col, first_int_from_text, to_float, normalize_invoice_upc_series, digit_count_series, sanitize_columns
 
-class UnifiedParser:
+class UnifiedParser(InvoiceParser):
     name = "Unified (SVMERCH)"
+    version = "1"
     tokens = ["Item UPC","Net Case Cost","Case Qty","Invoice Date","Brand","Description","Pack","Size","Cost"]
 
     def parse(self, uploaded_file) -> pd.DataFrame:
-        name = uploaded_file.name.lower()
-        if name.endswith(".csv"):
-            df_raw = pd.read_csv(uploaded_file, header=None, dtype=str, keep_default_na=False)
-        else:
-            df_raw = pd.read_excel(uploaded_file, header=None, dtype=str)
+        df_raw = LoadedInvoice.load(uploaded_file).grid
 
         header_tokens = self.tokens
         best_row_idx, best_hits = None, 0
@@ -51,7 +49,7 @@ class UnifiedParser:
         col_caseqty  = find_col(cols, ["Case Qty","Case Quantity","Cases","Qty"])
         col_invdate  = find_col(cols, ["Invoice Date","Inv Date","Date"])
 
-        inv_df = inv_df[inv_df[col_item_upc].astype(str).apply(lambda x: len(re.sub(r"\D","", str(x))) >= 8)]
+        inv_df = inv_df[digit_count_series(inv_df[col_item_upc].astype(str)) >= 8]
         case_qty_num = pd.to_numeric(inv_df[col_caseqty].apply(first_int_from_text) if col_caseqty else np.nan, errors="coerce")
         inv_df = inv_df[case_qty_num.fillna(0) > 0]
 
@@ -63,7 +61,7 @@ class UnifiedParser:
 
         out = pd.DataFrame()
         out["invoice_date"] = inv_df["_invoice_date"]
-        out["UPC"]          = inv_df[col_item_upc].astype(str).apply(normalize_invoice_upc)
+        out["UPC"]          = normalize_invoice_upc_series(inv_df[col_item_upc].astype(str))
         out["Brand"]        = inv_df[col_brand].astype(str) if col_brand else ""
         out["Description"]  = inv_df[col_desc].astype(str) if col_desc else ""
         out["Pack"]         = inv_df[col_pack].apply(first_int_from_text) if col_pack else np.nan
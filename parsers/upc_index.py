@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Sorted uint64 UPC keys with the row position each key came from.
+class UPCIndex:
+    def __init__(self, keys: np.ndarray):
+        keys = np.asarray(keys, dtype=np.uint64)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.positions = order
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        # Row position for each key, -1 where the key is not indexed.
+        keys = np.asarray(keys, dtype=np.uint64)
+        if not len(self.keys):
+            return np.full(len(keys), -1, dtype=np.int64)
+        at = np.searchsorted(self.keys, keys)
+        at_c = np.minimum(at, len(self.keys) - 1)
+        hit = self.keys[at_c] == keys
+        return np.where(hit, self.positions[at_c], -1).astype(np.int64)
+
+    def contains(self, keys: np.ndarray) -> np.ndarray:
+        return self.lookup(keys) >= 0
+
+def date_sort_keys(dates: pd.Series) -> np.ndarray:
+    # int64 sort keys for invoice dates; missing dates sort last, like sort_values.
+    dates = pd.Series(dates, copy=False)
+    if isinstance(dates.dtype, pd.ArrowDtype) and pa.types.is_temporal(dates.dtype.pyarrow_dtype):
+        ns = pa.array(dates.array).cast(pa.timestamp("ns")).cast(pa.int64())
+        return ns.fill_null(np.iinfo(np.int64).max).to_numpy()
+    ts = pd.to_datetime(dates, errors="coerce")
+    out = ts.to_numpy(dtype="datetime64[ns]").view(np.int64).copy()
+    out[ts.isna().to_numpy()] = np.iinfo(np.int64).max
+    return out
+
+def latest_per_key(keys: np.ndarray, dates: pd.Series) -> np.ndarray:
+    # Positions of the latest row per key, in key order. Same rows as
+    # sort_values([key, date]).drop_duplicates(key, keep="last"): undated rows
+    # sort after dated ones and ties keep the later row.
+    keys = np.asarray(keys, dtype=np.uint64)
+    if not len(keys):
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((np.arange(len(keys)), date_sort_keys(dates), keys))
+    sk = keys[order]
+    last = np.ones(len(sk), dtype=bool)
+    last[:-1] = sk[:-1] != sk[1:]
+    return order[last]
@@ -1,9 +1,13 @@
 
 import re
+import unicodedata
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
 
 IGNORE_UPCS = set(["000000000000", "003760010302", "023700052551"])
+IGNORE_KEYS = np.array(sorted(int(u) for u in IGNORE_UPCS), dtype=np.uint64)
 
 def digits_only(s):
     return re.sub(r"\D", "", str(s)) if pd.notna(s) else ""
@@ -27,6 +31,164 @@ def normalize_pos_upc(raw: str) -> str:
     if len(d) > 12: d = d[-12:]
     return d.zfill(12)
 
+def digits_only_series(s: pd.Series) -> pd.Series:
+    s = s.where(s.notna(), "")
+    return s.astype(str).str.replace(r"\D", "", regex=True)
+
+def ascii_digits(s) -> str:
+    # Decimal digits only (what \D keeps, Unicode digits included), as ASCII 0-9.
+    return "".join(str(unicodedata.decimal(c)) for c in str(s) if c.isdecimal()) if pd.notna(s) else ""
+
+def is_arrow_string(s: pd.Series) -> bool:
+    return isinstance(s.dtype, pd.StringDtype) and s.dtype.storage == "pyarrow"
+
+def to_arrow(df: pd.DataFrame, dtypes: dict = None) -> pd.DataFrame:
+    # Arrow-backed copy: columns in `dtypes` get that dtype, other object columns
+    # string[pyarrow], numeric ones the matching Arrow type.
+    dtypes = dtypes or {}
+    out = {}
+    for c in df.columns:
+        s = df[c]
+        if c in dtypes:
+            out[c] = s.astype(dtypes[c])
+        elif s.dtype == object:
+            out[c] = s.astype("string[pyarrow]")
+        elif isinstance(s.dtype, pd.ArrowDtype) or is_arrow_string(s):
+            out[c] = s
+        else:
+            out[c] = s.astype(pd.ArrowDtype(pa.array(s.iloc[:0]).type))
+    return pd.DataFrame(out, index=df.index)
+
+def _arrow_char_matrix(s: pd.Series):
+    # Same matrix straight from the Arrow buffers: right-pad every value with NULs
+    # to the longest one and view the data buffer, no Python strings in between.
+    arr = pa.array(s.array)
+    if isinstance(arr, pa.ChunkedArray):
+        arr = arr.combine_chunks()
+    arr = pc.fill_null(arr, "")
+    if not len(arr):
+        return np.zeros((0, 1), dtype=np.uint8), np.zeros((0, 1), dtype=bool)
+    if not pc.all(pc.string_is_ascii(arr)).as_py():
+        return None
+    w = max(pc.max(pc.binary_length(arr)).as_py(), 1)
+    padded = pc.utf8_rpad(arr, w, "\0")
+    offsets, data = padded.buffers()[1:3]
+    off_type = np.int64 if pa.types.is_large_string(padded.type) else np.int32
+    start = np.frombuffer(offsets, dtype=off_type)[padded.offset]
+    mat = np.frombuffer(data, dtype=np.uint8, count=len(padded) * w, offset=int(start)).reshape(len(padded), w)
+    return mat, (mat >= 48) & (mat <= 57)
+
+def _char_matrix(s: pd.Series):
+    # (n, w) ASCII byte matrix plus its digit mask; None if any row holds a non-ASCII
+    # character (\D would keep Unicode digits there, so callers use the scalar path).
+    if is_arrow_string(s):
+        return _arrow_char_matrix(s)
+    vals = s.where(s.notna(), "").astype(str).tolist()
+    try:
+        raw = np.array(vals, dtype="S") if vals else np.zeros(0, dtype="S1")
+    except UnicodeEncodeError:
+        return None
+    mat = raw.view(np.uint8).reshape(len(vals), raw.dtype.itemsize)
+    return mat, (mat >= 48) & (mat <= 57)
+
+def _digit_matrix(mat, mask, width: int, keep_first: bool = False) -> np.ndarray:
+    # Right-align each row's digits into an (n, width) ASCII matrix, left-padded with
+    # "0": d[-width:].zfill(width), or d[:width].zfill(width) when keep_first.
+    n, w = mat.shape
+    if (mask | (mat == 0)).all():
+        lens = mask.sum(axis=1)
+        if n and (lens == lens[0]).all() and lens[0] >= width:
+            return mat[:, :width] if keep_first else mat[:, lens[0] - width:lens[0]]
+    out = np.full(n * width, ord("0"), dtype=np.uint8)
+    base = np.arange(n, dtype=np.int64) * width
+    taken = np.zeros(n, dtype=np.int64)
+    if keep_first:
+        cnt = np.minimum(mask.sum(axis=1), width)
+        for c in range(w):
+            sel = mask[:, c] & (taken < cnt)
+            out[(base + width - cnt + taken)[sel]] = mat[sel, c]
+            taken += sel
+    else:
+        for c in range(w - 1, -1, -1):
+            sel = mask[:, c] & (taken < width)
+            out[(base + width - 1 - taken)[sel]] = mat[sel, c]
+            taken += sel
+    return out.reshape(n, width)
+
+def _check_digits(core: np.ndarray) -> np.ndarray:
+    d = core.astype(np.int64) - ord("0")
+    s = d[:, 0::2].sum(axis=1) * 3 + d[:, 1::2].sum(axis=1)
+    return ((10 - (s % 10)) % 10 + ord("0")).astype(np.uint8)
+
+def _matrix_to_strings(mat: np.ndarray, index, arrow: bool = False) -> pd.Series:
+    if arrow:
+        # Fixed-width rows are already a valid Arrow string data buffer.
+        n, w = mat.shape
+        offsets = pa.py_buffer(np.arange(n + 1, dtype=np.int64) * w)
+        arr = pa.Array.from_buffers(pa.large_string(), n, [None, offsets, pa.py_buffer(np.ascontiguousarray(mat))])
+        return pd.Series(pd.arrays.ArrowStringArray(arr), index=index)
+    if len(mat) == 0:
+        return pd.Series([], index=index, dtype=object)
+    vals = np.ascontiguousarray(mat).view(f"S{mat.shape[1]}").ravel().astype(str)
+    return pd.Series(vals, index=index, dtype=object)
+
+def digit_count_series(s: pd.Series) -> pd.Series:
+    cm = _char_matrix(s)
+    if cm is None:
+        return digits_only_series(s).str.len()
+    return pd.Series(cm[1].sum(axis=1), index=s.index)
+
+def upc_check_digit_series(core11: pd.Series) -> pd.Series:
+    cm = _char_matrix(core11)
+    if cm is None:
+        return core11.astype(str).apply(upc_check_digit)
+    chk = _check_digits(_digit_matrix(*cm, 11, keep_first=True))
+    return _matrix_to_strings(chk[:, None], core11.index)
+
+def normalize_invoice_upc_series(raw: pd.Series) -> pd.Series:
+    cm = _char_matrix(raw)
+    if cm is None:
+        return raw.apply(normalize_invoice_upc)
+    core = _digit_matrix(*cm, 11)
+    return _matrix_to_strings(np.hstack([core, _check_digits(core)[:, None]]), raw.index, is_arrow_string(raw))
+
+def normalize_pos_upc_series(raw: pd.Series) -> pd.Series:
+    cm = _char_matrix(raw)
+    if cm is None:
+        return raw.apply(normalize_pos_upc)
+    padded = _digit_matrix(*cm, 12)
+    core = padded[:, 1:]
+    with_check = np.hstack([core, _check_digits(core)[:, None]])
+    is11 = (cm[1].sum(axis=1) == 11)[:, None]
+    return _matrix_to_strings(np.where(is11, with_check, padded), raw.index, is_arrow_string(raw))
+
+def upc_keys(upcs: pd.Series) -> np.ndarray:
+    # Normalized 12-digit UPCs as uint64 keys (the UPC read as a decimal number).
+    cm = _char_matrix(upcs)
+    if cm is None:
+        cm = _char_matrix(upcs.map(ascii_digits, na_action="ignore").str[-12:].astype(object))
+    d = _digit_matrix(*cm, 12).astype(np.uint64) - np.uint64(ord("0"))
+    keys = np.zeros(len(d), dtype=np.uint64)
+    for c in range(12):
+        keys = keys * np.uint64(10) + d[:, c]
+    return keys
+
+def keys_to_upc(keys: np.ndarray, index=None) -> pd.Series:
+    keys = np.asarray(keys, dtype=np.uint64)
+    mat = np.empty((len(keys), 12), dtype=np.uint8)
+    rest = keys.copy()
+    for c in range(11, -1, -1):
+        mat[:, c] = (rest % np.uint64(10)).astype(np.uint8) + ord("0")
+        rest //= np.uint64(10)
+    return _matrix_to_strings(mat, index if index is not None else pd.RangeIndex(len(keys)))
+
+def pos_upc_column(columns):
+    return "Upc" if "Upc" in columns else ("UPC" if "UPC" in columns else columns[0])
+
+def pos_upc_keys(pos_df: pd.DataFrame) -> np.ndarray:
+    col = pos_df[pos_upc_column(pos_df.columns)]
+    return upc_keys(normalize_pos_upc_series(col if is_arrow_string(col) else col.astype(str)))
+
 def first_int_from_text(s):
     m = re.search(r"\d+", str(s) if pd.notna(s) else "")
     return int(m.group(0)) if m else np.nan
@@ -38,6 +200,36 @@ def to_float(x):
     try: return float(s)
     except: return np.nan
 
+def row_lines(df: pd.DataFrame) -> pd.Series:
+    # " ".join of each row's non-blank cells, built one column at a time.
+    line = pd.Series("", index=df.index, dtype=object)
+    for c in df.columns:
+        v = df[c].fillna("").astype(str)
+        keep = v.str.strip() != ""
+        sep = np.where(keep & (line != ""), " ", "")
+        line = line + sep + v.where(keep, "")
+    return line
+
+def extract_if(lines: pd.Series, upper: pd.Series, literal: str, pattern) -> pd.Series:
+    # lines.str.extract(pattern), only run on rows whose upper-cased text contains
+    # `literal` (which every match must include) to skip most of the regex work.
+    has = upper.str.contains(literal, regex=False)
+    out = pd.Series(np.nan, index=lines.index, dtype=object)
+    if has.any():
+        out[has] = lines[has].str.extract(pattern, expand=False)
+    return out
+
+def first_match(mask: pd.Series, default: int = 0) -> int:
+    hits = np.flatnonzero(mask.to_numpy(dtype=bool))
+    return int(hits[0]) if len(hits) else default
+
+def last_per_group(values: pd.Series, groups: pd.Series, mask: pd.Series = None, keep: str = "last") -> pd.Series:
+    # Value from the last (or first) matched row of each group, indexed by group.
+    if mask is None:
+        mask = values.notna()
+    s = pd.Series(values[mask].to_numpy(), index=groups[mask].to_numpy())
+    return s[~s.index.duplicated(keep=keep)]
+
 def find_col(cols, candidates):
     low = [c.lower() for c in cols]
     for cand in candidates:
@@ -0,0 +1,12 @@
+from .core import (
+    AUTO_DETECT, ProcessResult, StreamResult, StoresResult, InvoiceIndex, process, process_streaming, process_stores,
+    match_index,
+    parse_invoice, parse_invoices, ingest_invoices, build_invoice_index, ledger_invoice_index, match_pricebook, detect_vendor,
+    read_pos,
+    df_to_csv_bytes, dfs_to_xlsx_bytes, audit_sheets, export_filenames, build_export, write_exports, stores_zip_bytes,
+)
+from .invoice_cache import InvoiceCache, DEFAULT_CACHE_DIR
+from .invoice_ledger import InvoiceLedger, DEFAULT_LEDGER_DIR
+from .perf import PerfLog, DEFAULT_PERF_LOG
+from .pricebook_store import PricebookStore, DEFAULT_STORE_PATH
+from .pricing import MarginTarget, DEFAULT_MARGIN, DEFAULT_TARGETS, DELTA_TOLERANCE, goal_sheet, parse_target, parse_targets
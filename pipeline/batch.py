@@ -0,0 +1,121 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+
+from parsers import ALL_PARSERS
+from .core import AUTO_DETECT, process, process_streaming, write_exports
+from .pricing import DEFAULT_TARGETS, DELTA_TOLERANCE, parse_targets
+from .invoice_cache import InvoiceCache, DEFAULT_CACHE_DIR
+from .perf import PerfLog, DEFAULT_PERF_LOG
+
+INVOICE_EXTS = (".xlsx", ".xls", ".csv", ".pdf")
+
+# Input layout, one folder per store:
+#   <root>/<store>/pos/<pricebook>.csv
+#   <root>/<store>/invoices/<invoice files>
+# Returns (stores, notes): notes are (store, message) for folders that were skipped
+# and for extra pricebooks that were ignored.
+def find_stores(root) -> tuple:
+    stores, notes = [], []
+    for store_dir in sorted(p for p in Path(root).iterdir() if p.is_dir()):
+        pos = sorted((store_dir / "pos").glob("*.csv"))
+        invoices = sorted(p for p in (store_dir / "invoices").glob("*") if p.suffix.lower() in INVOICE_EXTS)
+        if not pos:
+            notes.append((store_dir.name, "skipped: no pos/*.csv pricebook"))
+        elif not invoices:
+            notes.append((store_dir.name, "skipped: no invoice files in invoices/"))
+        else:
+            if len(pos) > 1:
+                notes.append((store_dir.name, f"using {pos[0].name}, ignoring {', '.join(p.name for p in pos[1:])}"))
+            stores.append((store_dir.name, pos[0], invoices))
+    return stores, notes
+
+def run_store(store: str, pos_path, invoice_paths, out_dir, vendor_choice: str = AUTO_DETECT, ts: str = None,
+              cache_dir=None, chunksize: int = None, timed: bool = False, arrow: bool = False,
+              targets=DEFAULT_TARGETS, tolerance: float = DELTA_TOLERANCE) -> dict:
+    ts = ts or datetime.now().strftime("%Y%m%d_%H%M%S")
+    started = time.perf_counter()
+    with ExitStack() as stack:
+        pos_file = stack.enter_context(open(pos_path, "rb"))
+        invoices = [stack.enter_context(open(p, "rb")) for p in invoice_paths]
+        cache = InvoiceCache(cache_dir) if cache_dir else None
+        perf = PerfLog() if timed else None
+        if chunksize:
+            res = process_streaming(pos_file, invoices, vendor_choice, Path(out_dir) / store, ts,
+                                    cache=cache, chunksize=chunksize, perf=perf, arrow=arrow, targets=targets, tolerance=tolerance)
+            n_full, n_changed = res.full_rows, res.changed_rows
+        else:
+            res = process(pos_file, invoices, vendor_choice, cache=cache, perf=perf, arrow=arrow, targets=targets, tolerance=tolerance)
+            write_exports(Path(out_dir) / store, ts, *res[:4], perf=perf)
+            n_full, n_changed = len(res.full_export_df), len(res.pos_update_df)
+    return {
+        "store": store, "full": n_full, "changed": n_changed,
+        "unmatched": len(res.unmatched_df), "seconds": round(time.perf_counter() - started, 2),
+        "errors": res.errors, "perf": perf.records if perf else [],
+    }
+
+def run_batch(root, out_dir, vendor_choice: str = AUTO_DETECT, workers: int = None, cache_dir=None,
+              chunksize: int = None, timed: bool = False, arrow: bool = False, targets=DEFAULT_TARGETS,
+              tolerance: float = DELTA_TOLERANCE) -> tuple:
+    ts = datetime.now().strftime("%Y%m%d_%H%M%S")
+    # Returns (done, failed, notes); notes come from find_stores.
+    done, failed = [], []
+    stores, notes = find_stores(root)
+    with ProcessPoolExecutor(max_workers=workers) as ex:
+        futs = {ex.submit(run_store, name, pos, invs, out_dir, vendor_choice, ts, cache_dir, chunksize, timed, arrow, targets, tolerance): name for name, pos, invs in stores}
+        for fut in as_completed(futs):
+            try:
+                done.append(fut.result())
+            except Exception as e:
+                failed.append((futs[fut], f"{type(e).__name__}: {e}"))
+    done.sort(key=lambda r: r["store"])
+    failed.sort()
+    return done, failed, notes
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m pipeline", description="Process every store's invoices against its POS pricebook.")
+    ap.add_argument("input_dir", help="folder with one <store>/pos/*.csv + <store>/invoices/* per store")
+    ap.add_argument("output_dir", help="exports are written to <output_dir>/<store>/")
+    ap.add_argument("--vendor", default=AUTO_DETECT, choices=[AUTO_DETECT] + [p.name for p in ALL_PARSERS],
+                    help="parser override (default: auto-detect per file)")
+    ap.add_argument("--workers", type=int, default=None, help="parallel store processes (default: CPU count)")
+    ap.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR), help="parsed-invoice cache (default: %(default)s)")
+    ap.add_argument("--no-cache", action="store_true", help="always re-parse invoices")
+    ap.add_argument("--chunksize", type=int, default=None,
+                    help="stream each pricebook this many rows at a time (bounded memory for huge files)")
+    ap.add_argument("--margin", action="append", default=[], metavar="SPEC",
+                    help="Goal Sheet margin target, repeatable: 35, dept:BEER=25,WINE=30,*=35 or vendor:NAME=30, optionally LABEL@SPEC (default: 40)")
+    ap.add_argument("--tolerance", type=float, default=DELTA_TOLERANCE, metavar="DOLLARS",
+                    help="Goal Sheet goal moves under this show as = in the Delta columns (default: %(default)s)")
+    ap.add_argument("--arrow", action="store_true", help="Arrow-backed frames: less memory per store")
+    ap.add_argument("--perf-log", default=DEFAULT_PERF_LOG, help="append per-stage timings to this JSON-lines file")
+    args = ap.parse_args(argv)
+    try:
+        targets = parse_targets(args.margin)
+    except ValueError as e:
+        ap.error(str(e))
+    if args.tolerance < 0:
+        ap.error(f"--tolerance must be at least 0, got {args.tolerance}")
+
+    cache_dir = None if args.no_cache else args.cache_dir
+    done, failed, notes = run_batch(args.input_dir, args.output_dir, args.vendor, args.workers, cache_dir, args.chunksize,
+                             timed=bool(args.perf_log), arrow=args.arrow, targets=targets, tolerance=args.tolerance)
+    for r in done:
+        if args.perf_log:
+            log = PerfLog()
+            log.extend(r["perf"])
+            log.write_jsonl(args.perf_log, store=r["store"])
+        print(f"{r['store']}: FULL rows {r['full']} | Only-changed {r['changed']} | Unmatched {r['unmatched']} | {r['seconds']}s")
+        for name, err in r["errors"]:
+            print(f"{r['store']}: skipped {Path(name).name}: {err}", file=sys.stderr)
+    for store, note in notes:
+        print(f"{store}: {note}", file=sys.stderr)
+    for store, err in failed:
+        print(f"{store}: FAILED {err}", file=sys.stderr)
+    if not done:
+        print(f"no stores processed under {args.input_dir}", file=sys.stderr)
+    return 1 if failed or not done else 0
@@ -0,0 +1,493 @@
+import re
+import zipfile
+import pandas as pd
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from itertools import repeat
+from pathlib import Path
+from typing import NamedTuple
+
+from parsers import ALL_PARSERS, LoadedInvoice, get_parser
+from parsers.base import ARROW_DTYPES, STANDARD_COLS, VENDOR_COL
+from parsers.pdf import iter_pages
+from parsers.detect import Detection, DetectionCache, Fingerprinter, detection_text, structure_signature
+from parsers.utils import is_arrow_string, pos_upc_keys, sanitize_columns, to_arrow, upc_keys, keys_to_upc, IGNORE_KEYS
+from parsers.upc_index import UPCIndex, latest_per_key
+from .invoice_cache import InvoiceCache
+from .invoice_ledger import InvoiceLedger
+from .perf import PerfLog, stage
+from .pricebook_store import PricebookStore
+from .pricing import DEFAULT_TARGETS, DELTA_TOLERANCE, goal_sheet, goal_sheet_columns
+from .xlsx_stream import XlsxStreamWriter
+
+AUTO_DETECT = "Auto‑detect"
+
+GS1_COLS = ["UPC"] + goal_sheet_columns(DEFAULT_TARGETS)
+UNMATCHED_COLS = ["UPC","Brand","Description","Pack","+Cost","Case Qty","invoice_date"]
+
+class InvoiceIndex(NamedTuple):
+    lines: pd.DataFrame  # latest invoice line per UPC (no UPC column), in key order
+    keys: np.ndarray     # uint64 UPC key per line
+    index: UPCIndex
+
+class ProcessResult(NamedTuple):
+    full_export_df: pd.DataFrame
+    pos_update_df: pd.DataFrame
+    gs1_df: pd.DataFrame
+    unmatched_df: pd.DataFrame
+    errors: list  # (invoice file name, message) for invoices that failed to parse
+
+class StreamResult(NamedTuple):
+    paths: dict  # export kind -> file written (see export_filenames)
+    full_rows: int
+    changed_rows: int
+    full_preview: pd.DataFrame  # first rows of the full export
+    gs1_df: pd.DataFrame
+    unmatched_df: pd.DataFrame
+    errors: list
+
+class StoresResult(NamedTuple):
+    stores: dict  # store name -> ProcessResult, in pricebook order
+    failed: list  # (store name, message) for pricebooks that couldn't be matched
+    errors: list  # (invoice file name, message) for invoices that failed to parse
+
+def df_to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+def dfs_to_xlsx_bytes(dfs: dict) -> bytes:
+    bio = BytesIO()
+    with XlsxStreamWriter(bio) as xlsx:
+        for name, d in dfs.items():
+            xlsx.write_frame(name, d)
+    return bio.getvalue()
+
+def export_filenames(ts: str) -> dict:
+    return {
+        "changed_csv": f"POS_Update_OnlyChanged_{ts}.csv",
+        "full_csv":    f"POS_Full_AllItems_{ts}.csv",
+        "audit_xlsx":  f"Unified_Audit_{ts}_with_GoalSheet1.xlsx",
+    }
+
+def audit_sheets(pos_update_df, gs1_df, unmatched_df) -> dict:
+    return {
+        "Changes Only": pos_update_df,
+        "Goal Sheet 1": gs1_df,
+        "Unmatched":    unmatched_df,
+    }
+
+def build_export(kind: str, full_export_df, pos_update_df, gs1_df, unmatched_df, perf: PerfLog = None) -> bytes:
+    # Bytes for one export_filenames() kind.
+    if kind == "audit_xlsx":
+        rows = len(pos_update_df) + len(gs1_df) + len(unmatched_df)
+    else:
+        rows = len(pos_update_df if kind == "changed_csv" else full_export_df)
+    with stage(perf, f"export:{kind}", rows_in=rows) as rec:
+        if kind == "changed_csv":
+            data = df_to_csv_bytes(pos_update_df)
+        elif kind == "full_csv":
+            data = df_to_csv_bytes(full_export_df)
+        else:
+            data = dfs_to_xlsx_bytes(audit_sheets(pos_update_df, gs1_df, unmatched_df))
+        rec["bytes_out"] = len(data)
+    return data
+
+def write_exports(out_dir, ts, full_export_df, pos_update_df, gs1_df, unmatched_df, perf: PerfLog = None) -> dict:
+    # Same files the download buttons serve, written to out_dir.
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = export_filenames(ts)
+    for kind, name in names.items():
+        (out_dir / name).write_bytes(build_export(kind, full_export_df, pos_update_df, gs1_df, unmatched_df, perf))
+    return {k: out_dir / v for k, v in names.items()}
+
+FINGERPRINTER = Fingerprinter(ALL_PARSERS)
+DETECTIONS = DetectionCache()
+
+def detect_vendor(file, cache: InvoiceCache = None, perf: PerfLog = None) -> Detection:
+    # Fingerprints a raw prefix of the file (no pandas for CSV/XLSX). Unambiguous
+    # results are remembered per structure signature, in process and in `cache`.
+    inv = LoadedInvoice.load(file)
+    with stage(perf, "read_head_text", file=inv.name) as rec:
+        try:
+            text = detection_text(inv)
+        except ImportError:
+            raise
+        except Exception:
+            text = ""
+        rec["bytes_out"] = len(text)
+    with stage(perf, "autodetect", file=inv.name, bytes_in=len(text)) as rec:
+        sig = structure_signature(text)
+        det = DETECTIONS.get(sig)
+        if det is None and cache is not None:
+            name = cache.detected(f"sig-{sig}")
+            if name in {p.name for p in ALL_PARSERS}:
+                det = Detection(get_parser(name), 1.0, False, {})  # only unambiguous results are stored
+        if det is None:
+            det = FINGERPRINTER.detect(text)
+            if cache is not None and not det.ambiguous:
+                cache.remember_detected(f"sig-{sig}", det.parser.name)
+        DETECTIONS.put(sig, det)
+        rec["confidence"] = round(det.confidence, 3)
+    return det
+
+def _decode(inv: LoadedInvoice, perf: PerfLog):
+    # Time the sheet decode on its own so it isn't billed to detection or the parser.
+    if perf is None or inv.decoded or inv.is_pdf:
+        return
+    with perf.stage("decode", file=inv.name, bytes_in=len(inv.data)) as rec:
+        rec["rows_out"] = len(inv.grid)
+
+def _parse_with_parser(inv: LoadedInvoice, vendor_choice: str, cache: InvoiceCache = None, perf: PerfLog = None,
+                       page_workers: int = 1) -> tuple:
+    if vendor_choice != AUTO_DETECT:
+        parser = get_parser(vendor_choice)
+    else:
+        name = cache.detected(inv.digest) if cache is not None else None
+        if name in {p.name for p in ALL_PARSERS}:
+            parser = get_parser(name)
+        else:
+            det = detect_vendor(inv, cache, perf)
+            if det.ambiguous:
+                found = ", ".join(f"{n}: {h}" for n, h in det.hits.items())
+                raise ValueError(f"can't tell which vendor this is (token hits {found}, confidence {det.confidence:.2f}); "
+                                 "choose a parser override")
+            parser = det.parser
+            if cache is not None:
+                cache.remember_detected(inv.digest, parser.name)
+    if cache is not None:
+        with stage(perf, "cache_get", file=inv.name) as rec:
+            parsed = cache.get(inv.digest, parser)
+            rec["rows_out"] = None if parsed is None else len(parsed)
+        if parsed is not None:
+            return parser, parsed
+    _decode(inv, perf)
+    with stage(perf, f"parse:{parser.name}", file=inv.name, bytes_in=len(inv.data)) as rec:
+        if inv.is_pdf:
+            parsed = parser.parse_pages(iter_pages(inv, page_workers, cache))
+        else:
+            parsed = parser.parse(inv)
+            rec["rows_in"] = len(inv.grid)
+        rec["rows_out"] = len(parsed)
+    if cache is not None:
+        with stage(perf, "cache_put", file=inv.name, rows_in=len(parsed)):
+            cache.put(inv.digest, parser, parsed)
+    return parser, parsed
+
+def parse_invoice(f, vendor_choice: str, cache: InvoiceCache = None, perf: PerfLog = None) -> pd.DataFrame:
+    return _parse_with_parser(LoadedInvoice.load(f), vendor_choice, cache, perf)[1]
+
+def _parse_one(inv: LoadedInvoice, vendor_choice: str, cache: InvoiceCache, timed: bool = False, page_workers: int = 1):
+    # Records are collected locally and returned, so worker processes report theirs too.
+    perf = PerfLog() if timed else None
+    try:
+        parser, df = _parse_with_parser(inv, vendor_choice, cache, perf, page_workers)
+        return df, parser.name, None, perf.records if perf else []
+    except Exception as e:
+        return None, None, f"{type(e).__name__}: {e}", perf.records if perf else []
+
+def _parse_all(invs: list, vendor_choice: str, cache: InvoiceCache = None, workers: int = 1, perf: PerfLog = None) -> list:
+    # (frame, parser name, error) per invoice, in input order. Files are spread over
+    # the workers; a lone file gets them for its PDF pages instead.
+    timed = perf is not None
+    if workers > 1 and len(invs) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(invs))) as ex:
+            results = list(ex.map(_parse_one, invs, repeat(vendor_choice), repeat(cache), repeat(timed)))
+    else:
+        results = [_parse_one(inv, vendor_choice, cache, timed, workers) for inv in invs]
+    if perf is not None:
+        for *_, records in results:
+            perf.extend(records)
+    return [r[:3] for r in results]
+
+def _parse_files(invoice_files, vendor_choice: str, cache: InvoiceCache, workers: int, perf: PerfLog) -> tuple:
+    # (frames, parser names, errors), frames and names in upload order.
+    invs = [LoadedInvoice.load(f) for f in invoice_files]
+    results = _parse_all(invs, vendor_choice, cache, workers, perf)
+    frames = [df for df, _, err in results if err is None]
+    names = [name for _, name, err in results if err is None]
+    errors = [(inv.name, err) for inv, (_, _, err) in zip(invs, results) if err is not None]
+    return frames, names, errors
+
+def parse_invoices(invoice_files, vendor_choice: str, cache: InvoiceCache = None, workers: int = 1,
+                   perf: PerfLog = None) -> tuple:
+    # Parsed frames in upload order plus (file name, error) for files that failed;
+    # one bad file never cancels the rest of the batch.
+    frames, _, errors = _parse_files(invoice_files, vendor_choice, cache, workers, perf)
+    return frames, errors
+
+def ingest_invoices(ledger: InvoiceLedger, invoice_files, vendor_choice: str, cache: InvoiceCache = None,
+                    workers: int = 1, perf: PerfLog = None) -> tuple:
+    # Parse only the files the ledger hasn't seen and append them. Returns
+    # (lines added, errors).
+    seen = set(ledger.ingested())
+    invs = [inv for inv in map(LoadedInvoice.load, invoice_files) if inv.digest not in seen]
+    results = _parse_all(invs, vendor_choice, cache, workers, perf)
+    with stage(perf, "ledger_append") as rec:
+        added = ledger.append([(inv.digest, name, inv.name, df) for inv, (df, name, err) in zip(invs, results) if err is None])
+        rec["rows_out"] = added
+    errors = [(inv.name, err) for inv, (_, _, err) in zip(invs, results) if err is not None]
+    return added, errors
+
+def build_invoice_index(parsed_frames, vendors=None) -> InvoiceIndex:
+    # vendors: parser name per frame, kept per line as VENDOR_COL (for per-vendor margins).
+    inv_all = pd.concat(parsed_frames, ignore_index=True) if parsed_frames else pd.DataFrame(columns=STANDARD_COLS)
+    if vendors is not None:
+        inv_all[VENDOR_COL] = pd.Categorical(np.repeat(np.asarray(vendors, dtype=object), [len(df) for df in parsed_frames]))
+    inv_keys = upc_keys(inv_all["UPC"])
+    keep = ~np.isin(inv_keys, IGNORE_KEYS)
+    inv_all, inv_keys = inv_all[keep].drop(columns="UPC"), inv_keys[keep]
+    latest = latest_per_key(inv_keys, inv_all["invoice_date"])
+    inv_all, inv_keys = inv_all.iloc[latest], inv_keys[latest]
+    return InvoiceIndex(inv_all, inv_keys, UPCIndex(inv_keys))
+
+def ledger_invoice_index(ledger: InvoiceLedger) -> InvoiceIndex:
+    lines, keys = ledger.latest()
+    return InvoiceIndex(lines, keys, UPCIndex(keys))
+
+def _invoice_index(invoice_files, vendor_choice, cache, workers, ledger, perf, arrow: bool = False) -> tuple:
+    # arrow=True: parsed (or ledger) lines are cast to ARROW_DTYPES before indexing.
+    if ledger is not None:
+        _, errors = ingest_invoices(ledger, invoice_files, vendor_choice, cache, workers, perf)
+        with stage(perf, "ledger_index") as rec:
+            inv = ledger_invoice_index(ledger)
+            if arrow:
+                inv = inv._replace(lines=to_arrow(inv.lines, ARROW_DTYPES))
+            rec["rows_out"] = len(inv.lines)
+    else:
+        parsed_frames, vendors, errors = _parse_files(invoice_files, vendor_choice, cache, workers, perf)
+        with stage(perf, "build_invoice_index", rows_in=sum(map(len, parsed_frames))) as rec:
+            if arrow:
+                parsed_frames = [to_arrow(df, ARROW_DTYPES) for df in parsed_frames]
+            inv = build_invoice_index(parsed_frames, vendors)
+            rec["rows_out"] = len(inv.lines)
+    return inv, errors
+
+POS_READ_CHUNK = 50_000
+PREVIEW_ROWS = 200  # full-export rows process_streaming keeps for the preview
+
+def read_pos(pos_csv_file, arrow: bool = False, chunksize: int = None):
+    # Every POS column as text: object strings, or string[pyarrow] with arrow=True.
+    # A whole Arrow read still goes through pandas' parser a chunk at a time, so the
+    # object strings never exist for more than POS_READ_CHUNK rows at once.
+    dtype = "string[pyarrow]" if arrow else str
+    if arrow and not chunksize:
+        chunks = pd.read_csv(pos_csv_file, dtype=dtype, keep_default_na=False, na_values=[], chunksize=POS_READ_CHUNK)
+        return pd.concat(chunks)
+    return pd.read_csv(pos_csv_file, dtype=dtype, keep_default_na=False, na_values=[], chunksize=chunksize)
+
+def _group_values(by: str, pos_df: pd.DataFrame, pos_rows: np.ndarray, inv: InvoiceIndex, inv_rows: np.ndarray):
+    # Values of a margin target's `by` column for the matched rows: a POS column, or
+    # an invoice-line column ("vendor" is the parser each line came from).
+    if by in pos_df.columns:
+        return pos_df[by].iloc[pos_rows]
+    col = VENDOR_COL if by.lower() == "vendor" else by
+    if col in inv.lines.columns:
+        return inv.lines[col].iloc[inv_rows]
+    raise ValueError(f"margin target column {by!r} is not in the pricebook or the invoice lines")
+
+def match_pricebook(pos_df: pd.DataFrame, inv: InvoiceIndex, targets=DEFAULT_TARGETS,
+                    tolerance: float = DELTA_TOLERANCE) -> tuple:
+    # Full export, changed rows and unsorted Goal Sheet rows (with "UPC_key") for one
+    # pricebook frame or chunk, plus the invoice rows it matched. `targets` are the
+    # Goal Sheet margins (see pricing.MarginTarget); goal moves under `tolerance`
+    # dollars show as "=" in the Delta columns.
+    pos_keys = pos_upc_keys(pos_df)
+    pos_df["cost_qty_num"]   = pd.to_numeric(pos_df.get("cost_qty", np.nan), errors="coerce")
+    pos_df["cost_cents_num"] = pd.to_numeric(pos_df.get("cost_cents", np.nan), errors="coerce")
+    cents_col = "cents" if "cents" in pos_df.columns else next((c for c in pos_df.columns if "cent" in c.lower() and c.lower()!="cost_cents"), None)
+
+    hit = inv.index.lookup(pos_keys)
+    pos_rows = np.flatnonzero(hit >= 0)
+    inv_rows = hit[pos_rows]
+    inv_cols = inv.lines[["Pack","+Cost","invoice_date","Brand","Description","Size","Cost"]].iloc[inv_rows]
+    inv_cols.index = pos_df.index[pos_rows]
+    matched = pos_df.iloc[pos_rows].join(inv_cols, lsuffix="_x", rsuffix="_y")
+    matched_keys = inv.keys[inv_rows]
+
+    matched["new_cost_qty"]   = pd.to_numeric(matched["Pack"], errors="coerce")
+    matched.loc[matched["new_cost_qty"].isna() | (matched["new_cost_qty"]<=0), "new_cost_qty"] = 1
+    matched["new_cost_cents"] = (pd.to_numeric(matched["+Cost"], errors="coerce") * 100).round().astype("Int64")
+
+    original_pos_cols = [c for c in pos_df.columns if c not in ["cost_qty_num","cost_cents_num","cost_qty","cost_cents"]]
+    out = matched[[c for c in original_pos_cols if c in matched.columns]].copy()
+    for col in original_pos_cols:
+        if col not in out.columns:
+            out[col] = ""
+
+    int_dtype = "int64[pyarrow]" if is_arrow_string(pos_df.iloc[:, 0]) else pd.Int64Dtype()
+    out["cost_qty"]   = matched["new_cost_qty"].astype(int_dtype)
+    out["cost_cents"] = matched["new_cost_cents"].astype(int_dtype)
+    full_export_df = sanitize_columns(out[original_pos_cols + ["cost_qty","cost_cents"]])
+
+    qty_changed   = (matched["new_cost_qty"].astype("float64") != matched["cost_qty_num"].astype("float64"))
+    cents_changed = (matched["new_cost_cents"].astype("float64") != matched["cost_cents_num"].astype("float64"))
+    pos_update_df = sanitize_columns(full_export_df[qty_changed | cents_changed])
+
+    groups = {t.by: _group_values(t.by, pos_df, pos_rows, inv, inv_rows) for t in targets if t.by and t.overrides}
+    gs1 = goal_sheet(matched, matched[cents_col] if cents_col else None, targets, groups, tolerance)
+    gs1["UPC_key"] = matched_keys
+    gs1_rows = gs1[gs1["+Cost"].notna().to_numpy()][["UPC_key"] + goal_sheet_columns(targets)]
+    return full_export_df, pos_update_df, gs1_rows, inv_rows
+
+def finish_goal_sheet(gs1_rows: pd.DataFrame) -> pd.DataFrame:
+    gs1_out = gs1_rows.sort_values("UPC_key", kind="stable")
+    gs1_out.insert(0, "UPC", keys_to_upc(gs1_out["UPC_key"].to_numpy(), gs1_out.index))
+    return gs1_out.drop(columns="UPC_key").reset_index(drop=True)
+
+def unmatched_lines(inv: InvoiceIndex, matched_rows: np.ndarray) -> pd.DataFrame:
+    if inv.lines.empty:
+        return pd.DataFrame()
+    unmatched_rows = np.ones(len(inv.lines), dtype=bool)
+    unmatched_rows[matched_rows] = False
+    unmatched = inv.lines[unmatched_rows].copy()
+    unmatched.insert(0, "UPC", keys_to_upc(inv.keys[unmatched_rows], unmatched.index))
+    return unmatched[UNMATCHED_COLS]
+
+def process(pos_csv_file, invoice_files, vendor_choice: str, cache: InvoiceCache = None, workers: int = 1,
+            store: PricebookStore = None, ledger: InvoiceLedger = None, perf: PerfLog = None,
+            arrow: bool = False, targets=DEFAULT_TARGETS, tolerance: float = DELTA_TOLERANCE) -> ProcessResult:
+    # With pos_csv_file=None the pricebook comes from `store`: only rows for the invoice
+    # UPCs are looked up, and the resulting cost changes are written back to it.
+    # With a ledger, the uploads are appended to it and matching uses the latest
+    # cost per UPC over every invoice ever ingested, not just this upload.
+    # With arrow=True the pricebook and invoice frames stay Arrow-backed throughout;
+    # Python objects are only made when the audit workbook is written.
+    inv, errors = _invoice_index(invoice_files, vendor_choice, cache, workers, ledger, perf, arrow)
+
+    with stage(perf, "read_pos" if pos_csv_file is not None else "store_lookup") as rec:
+        if pos_csv_file is None:
+            pos_df = store.lookup(inv.keys)
+            if arrow:
+                pos_df = to_arrow(pos_df)
+        else:
+            pos_df = read_pos(pos_csv_file, arrow)
+        rec["rows_out"] = len(pos_df)
+    full_export_df, pos_update_df, gs1_df, unmatched = match_index(pos_df, inv, targets, perf, tolerance)
+    if pos_csv_file is None:
+        with stage(perf, "store_update", rows_in=len(pos_update_df)):
+            store.apply_updates(pos_update_df)
+    return ProcessResult(full_export_df, pos_update_df, gs1_df, unmatched, errors)
+
+def match_index(pos_df: pd.DataFrame, inv: InvoiceIndex, targets=DEFAULT_TARGETS, perf: PerfLog = None,
+                tolerance: float = DELTA_TOLERANCE) -> tuple:
+    # (full export, changed rows, Goal Sheet, unmatched invoice lines) for one whole
+    # pricebook against a built invoice index.
+    with stage(perf, "match_pricebook", rows_in=len(pos_df)) as rec:
+        full_export_df, pos_update_df, gs1_rows, inv_rows = match_pricebook(pos_df, inv, targets, tolerance)
+        rec["rows_out"] = len(full_export_df)
+    with stage(perf, "goal_sheet", rows_in=len(gs1_rows)) as rec:
+        gs1_df = finish_goal_sheet(gs1_rows)
+        rec["rows_out"] = len(gs1_df)
+    with stage(perf, "unmatched", rows_in=len(inv.lines)) as rec:
+        unmatched = unmatched_lines(inv, inv_rows)
+        rec["rows_out"] = len(unmatched)
+    return full_export_df, pos_update_df, gs1_df, unmatched
+
+_SHARED_INDEX = None
+
+def _share_index(inv: InvoiceIndex):
+    # Pool initializer: each worker gets the invoice index once, not once per store.
+    global _SHARED_INDEX
+    _SHARED_INDEX = inv
+
+def _match_store(store: str, pos_data: bytes, inv: InvoiceIndex, arrow: bool, targets, tolerance: float, timed: bool):
+    # (ProcessResult without invoice errors, error, perf records) for one pricebook.
+    perf = PerfLog() if timed else None
+    try:
+        with stage(perf, "read_pos", file=store, bytes_in=len(pos_data)) as rec:
+            pos_df = read_pos(BytesIO(pos_data), arrow)
+            rec["rows_out"] = len(pos_df)
+        res = ProcessResult(*match_index(pos_df, inv if inv is not None else _SHARED_INDEX, targets, perf, tolerance), [])
+        err = None
+    except Exception as e:
+        res, err = None, f"{type(e).__name__}: {e}"
+    records = perf.records if perf else []
+    for r in records:
+        r["file"] = r["file"] or store
+    return res, err, records
+
+def process_stores(pricebooks: dict, invoice_files, vendor_choice: str, cache: InvoiceCache = None, workers: int = 1,
+                   ledger: InvoiceLedger = None, perf: PerfLog = None, arrow: bool = False,
+                   targets=DEFAULT_TARGETS, tolerance: float = DELTA_TOLERANCE) -> StoresResult:
+    # One invoice batch against many stores: the invoices are parsed and deduped into
+    # one UPC index, then every pricebook (store name -> POS CSV file) is matched
+    # against it, up to `workers` stores at a time. A pricebook that fails to read
+    # or match only fails its own store.
+    inv, errors = _invoice_index(invoice_files, vendor_choice, cache, workers, ledger, perf, arrow)
+    names = list(pricebooks)
+    data = [pricebooks[n].read() for n in names]
+    timed = perf is not None
+    if workers > 1 and len(names) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(names)), initializer=_share_index, initargs=(inv,)) as ex:
+            results = list(ex.map(_match_store, names, data, repeat(None), repeat(arrow), repeat(targets), repeat(tolerance), repeat(timed)))
+    else:
+        results = [_match_store(n, d, inv, arrow, targets, tolerance, timed) for n, d in zip(names, data)]
+    stores, failed = {}, []
+    for name, (res, err, records) in zip(names, results):
+        if perf is not None:
+            perf.extend(records)
+        if err is None:
+            stores[name] = res._replace(errors=errors)
+        else:
+            failed.append((name, err))
+    return StoresResult(stores, failed, errors)
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[\\/:*?\"<>|]+", "_", name).strip(" .") or "store"
+
+def stores_zip_bytes(stores: dict, ts: str, perf: PerfLog = None) -> bytes:
+    # One folder per store holding that store's export_filenames(ts) files.
+    bio = BytesIO()
+    with zipfile.ZipFile(bio, "w", zipfile.ZIP_DEFLATED) as zf:
+        for store, res in stores.items():
+            for kind, name in export_filenames(ts).items():
+                zf.writestr(f"{_safe_name(store)}/{name}", build_export(kind, *res[:4], perf))
+    return bio.getvalue()
+
+def process_streaming(pos_csv_file, invoice_files, vendor_choice: str, out_dir, ts: str,
+                      cache: InvoiceCache = None, workers: int = 1, chunksize: int = 100_000,
+                      ledger: InvoiceLedger = None, perf: PerfLog = None, arrow: bool = False,
+                      targets=DEFAULT_TARGETS, tolerance: float = DELTA_TOLERANCE) -> StreamResult:
+    # Bounded-memory variant of process(): the pricebook is read `chunksize` rows at a
+    # time and each chunk's rows go straight to the CSV/XLSX files in out_dir. Only
+    # the invoice index, Goal Sheet rows and matched-invoice flags are held.
+    inv, errors = _invoice_index(invoice_files, vendor_choice, cache, workers, ledger, perf, arrow)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    names = export_filenames(ts)
+    paths = {k: out_dir / v for k, v in names.items()}
+    matched_inv = np.zeros(len(inv.lines), dtype=bool)
+    gs1_parts, preview_parts = [], []
+    n_full = n_changed = 0
+
+    reader = read_pos(pos_csv_file, arrow, chunksize=chunksize)
+    with open(paths["full_csv"], "w", encoding="utf-8", newline="") as full_csv, \
+         open(paths["changed_csv"], "w", encoding="utf-8", newline="") as changed_csv, \
+         XlsxStreamWriter(paths["audit_xlsx"]) as xlsx:
+        for i, chunk in enumerate(reader):
+            with stage(perf, "match_pricebook", rows_in=len(chunk)) as rec:
+                full_export_df, pos_update_df, gs1_rows, inv_rows = match_pricebook(chunk, inv, targets, tolerance)
+                rec["rows_out"] = len(full_export_df)
+            if i == 0:
+                xlsx.add_sheet("Changes Only", pos_update_df.columns)
+            if n_full < PREVIEW_ROWS:
+                preview_parts.append(full_export_df.head(PREVIEW_ROWS - n_full))
+            with stage(perf, "export_chunk", rows_in=len(full_export_df)):
+                full_export_df.to_csv(full_csv, index=False, header=(i == 0))
+                pos_update_df.to_csv(changed_csv, index=False, header=(i == 0))
+                xlsx.append("Changes Only", pos_update_df)
+            gs1_parts.append(gs1_rows)
+            matched_inv[inv_rows] = True
+            n_full += len(full_export_df)
+            n_changed += len(pos_update_df)
+        if "Changes Only" not in xlsx.sheets:
+            xlsx.add_sheet("Changes Only", [])
+        gs1_out = finish_goal_sheet(pd.concat(gs1_parts)) if gs1_parts else pd.DataFrame(columns=["UPC"] + goal_sheet_columns(targets))
+        unmatched = unmatched_lines(inv, np.flatnonzero(matched_inv))
+        xlsx.write_frame("Goal Sheet 1", gs1_out)
+        xlsx.write_frame("Unmatched", unmatched)
+    preview_parts = [p for p in preview_parts if len(p)] or preview_parts[:1]
+    preview = pd.concat(preview_parts) if preview_parts else None
+    return StreamResult(paths, n_full, n_changed, preview, gs1_out, unmatched, errors)
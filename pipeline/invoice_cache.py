@@ -0,0 +1,89 @@
+import os
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+from parsers.base import STANDARD_COLS
+from .storage import slug, write_parquet
+
+DEFAULT_CACHE_DIR = Path(os.environ.get("INVOICE_CACHE_DIR", Path.home() / ".cache" / "unified2" / "invoices"))
+
+# Parsed invoices on disk as Parquet, keyed by file content hash + parser name + parser
+# version. Hits refresh the file mtime, so eviction (oldest mtime first) is LRU.
+class InvoiceCache:
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes: int = 512 * 1024**2, max_age_days: float = 60):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str, parser) -> Path:
+        return self.root / f"{digest}-{slug(parser.name)}-v{parser.version}.parquet"
+
+    def get(self, digest: str, parser):
+        path = self._path(digest, parser)
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return df[STANDARD_COLS]
+
+    def put(self, digest: str, parser, df: pd.DataFrame):
+        # Frames pyarrow can't encode (mixed object columns) just aren't cached.
+        if write_parquet(df[STANDARD_COLS], self._path(digest, parser)):
+            self.evict()
+
+    # Auto-detect result per content hash, so cached files skip the head read too.
+    def detected(self, digest: str):
+        path = self.root / f"{digest}.parser"
+        try:
+            name = path.read_text(encoding="utf-8")
+            os.utime(path)
+            return name
+        except OSError:
+            return None
+
+    def remember_detected(self, digest: str, parser_name: str):
+        (self.root / f"{digest}.parser").write_text(parser_name, encoding="utf-8")
+
+    # Extracted PDF page text, so re-uploads and parser changes skip the extraction.
+    def page_lines(self, digest: str, page: int):
+        path = self.root / f"{digest}.p{page:05d}.txt"
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)
+        except OSError:
+            return None
+        return text.split("\n") if text else []
+
+    def put_page_lines(self, digest: str, page: int, lines: list):
+        path = self.root / f"{digest}.p{page:05d}.txt"
+        tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        tmp.write_text("\n".join(lines), encoding="utf-8")
+        os.replace(tmp, path)
+
+    def evict(self):
+        now = time.time()
+        entries = []
+        for p in self.root.iterdir():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if now - st.st_mtime > self.max_age:
+                p.unlink(missing_ok=True)
+            else:
+                entries.append((st.st_mtime, st.st_size, p))
+        total = sum(size for _, size, _ in entries)
+        for _, size, p in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            p.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for p in self.root.iterdir():
+            p.unlink(missing_ok=True)
@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from parsers.base import STANDARD_COLS, VENDOR_COL
+from parsers.utils import upc_keys, IGNORE_KEYS
+from parsers.upc_index import latest_per_key
+from .storage import slug, write_parquet
+
+DEFAULT_LEDGER_DIR = Path(os.environ.get("INVOICE_LEDGER_DIR", Path.home() / ".cache" / "unified2" / "ledger"))
+
+LINE_COLS = [c for c in STANDARD_COLS if c != "UPC"]
+
+# Every parsed invoice line ever ingested, as Parquet under
+# lines/vendor=<slug>/month=<YYYY-MM>/<digest>.parquet, plus latest.parquet: the
+# latest line per UPC key over the whole history. Ingesting a batch only merges
+# that batch into latest.parquet, so the cost tracks the batch, not the history.
+# Files are keyed by content hash and ingested at most once.
+class InvoiceLedger:
+    def __init__(self, root=DEFAULT_LEDGER_DIR):
+        self.root = Path(root)
+        self.lines_dir = self.root / "lines"
+        self.latest_path = self.root / "latest.parquet"
+        self.manifest_path = self.root / "ingested.tsv"
+        self.lines_dir.mkdir(parents=True, exist_ok=True)
+
+    def _manifest(self) -> list:
+        # (digest, vendor, file name, lines) rows in ingestion order.
+        try:
+            text = self.manifest_path.read_text(encoding="utf-8")
+        except OSError:
+            return []
+        return [line.split("\t") for line in text.splitlines() if line]
+
+    def ingested(self) -> list:
+        return [row[0] for row in self._manifest()]
+
+    def latest(self) -> tuple:
+        # (lines, uint64 keys) in key order, same shape as build_invoice_index's.
+        # Ledgers written before VENDOR_COL existed read back without it.
+        try:
+            df = pd.read_parquet(self.latest_path)
+        except (OSError, ValueError):
+            return pd.DataFrame(columns=LINE_COLS + [VENDOR_COL]), np.zeros(0, dtype=np.uint64)
+        return df[[c for c in LINE_COLS + [VENDOR_COL] if c in df.columns]], df["UPC_key"].to_numpy(dtype=np.uint64)
+
+    def append(self, batch) -> int:
+        # batch: (digest, vendor, file name, parsed frame) per new invoice file.
+        # Returns the number of lines added; already-ingested digests are skipped.
+        seen = set(self.ingested())
+        frames, keys, records = [], [], []
+        for digest, vendor, name, df in batch:
+            if digest in seen or df is None:
+                continue
+            seen.add(digest)
+            k = upc_keys(df["UPC"])
+            keep = ~np.isin(k, IGNORE_KEYS)
+            df, k = df[keep], k[keep]
+            month = pd.to_datetime(df["invoice_date"], errors="coerce").dt.strftime("%Y-%m").fillna("unknown")
+            for m, part in df.groupby(month.to_numpy(), sort=False):
+                out = self.lines_dir / f"vendor={slug(vendor)}" / f"month={m}"
+                out.mkdir(parents=True, exist_ok=True)
+                write_parquet(part[STANDARD_COLS], out / f"{digest}.parquet", stringify=True)
+            frames.append(df[LINE_COLS].assign(**{VENDOR_COL: vendor}))
+            keys.append(k)
+            records.append(f"{digest}\t{vendor}\t{name}\t{len(df)}\n")
+        if not records:
+            return 0
+        old_lines, old_keys = self.latest()
+        if len(old_lines):
+            frames, keys = [old_lines] + frames, [old_keys] + keys
+        self._write_latest(pd.concat(frames, ignore_index=True), np.concatenate(keys))
+        with open(self.manifest_path, "a", encoding="utf-8") as fh:
+            fh.writelines(records)
+        return sum(int(r.rsplit("\t", 1)[1]) for r in records)
+
+    def rebuild(self) -> int:
+        # Recompute latest.parquet from every stored line (after a crash or manual edits).
+        parts = [pd.read_parquet(p).assign(**{VENDOR_COL: row[1]}) for row in self._manifest()
+                 for p in sorted(self.lines_dir.glob(f"vendor=*/month=*/{row[0]}.parquet"))]
+        lines = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=STANDARD_COLS + [VENDOR_COL])
+        self._write_latest(lines[LINE_COLS + [VENDOR_COL]], upc_keys(lines["UPC"]))
+        return len(lines)
+
+    def _write_latest(self, lines: pd.DataFrame, keys: np.ndarray):
+        latest = latest_per_key(keys, lines["invoice_date"])
+        out = lines.iloc[latest].reset_index(drop=True)
+        out.insert(0, "UPC_key", keys[latest])
+        write_parquet(out, self.latest_path, stringify=True)
+
+    def clear(self):
+        for p in sorted(self.root.rglob("*"), reverse=True):
+            p.rmdir() if p.is_dir() else p.unlink(missing_ok=True)
+        self.lines_dir.mkdir(parents=True, exist_ok=True)
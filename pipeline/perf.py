@@ -0,0 +1,61 @@
+import json
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+DEFAULT_PERF_LOG = os.environ.get("PERF_LOG")  # JSON-lines file to append runs to, if set
+
+# Wall time, rows in/out and bytes read per stage (and per file where there is one).
+# Cheap enough to leave on: one perf_counter pair and a small dict per stage.
+class PerfLog:
+    def __init__(self):
+        self.records = []
+
+    @contextmanager
+    def stage(self, name: str, file: str = None, rows_in: int = None, bytes_in: int = None):
+        # The yielded dict is the record; set rec["rows_out"] (or anything else) inside.
+        rec = {"stage": name, "file": file, "rows_in": rows_in, "rows_out": None, "bytes_in": bytes_in, "bytes_out": None}
+        t = time.perf_counter()
+        try:
+            yield rec
+        finally:
+            rec["seconds"] = time.perf_counter() - t
+            self.records.append(rec)
+
+    def extend(self, records):
+        self.records.extend(records)
+
+    def frame(self) -> pd.DataFrame:
+        df = pd.DataFrame(self.records, columns=["stage", "file", "seconds", "rows_in", "rows_out", "bytes_in", "bytes_out", "confidence"])
+        counts = ["rows_in", "rows_out", "bytes_in", "bytes_out"]
+        df[counts] = df[counts].apply(pd.to_numeric).astype("Int64")
+        return df
+
+    def summary(self) -> pd.DataFrame:
+        # One row per stage, slowest first.
+        df = self.frame()
+        if df.empty:
+            return df
+        out = df.groupby("stage", sort=False).agg(
+            calls=("seconds", "size"), seconds=("seconds", "sum"),
+            rows_in=("rows_in", "sum"), rows_out=("rows_out", "sum"),
+            bytes_in=("bytes_in", "sum"), bytes_out=("bytes_out", "sum"),
+        )
+        return out.sort_values("seconds", ascending=False).reset_index()
+
+    def write_jsonl(self, path, start: int = 0, **meta):
+        # Appends one line per record from `start` on, tagged with `meta` (e.g. run=ts).
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        logged = datetime.now().isoformat(timespec="seconds")
+        with open(path, "a", encoding="utf-8") as fh:
+            for rec in self.records[start:]:
+                fh.write(json.dumps({"logged": logged, **meta, **rec}, default=str) + "\n")
+
+def stage(perf: PerfLog, name: str, **kw):
+    # perf.stage(...) when recording, otherwise a throwaway record.
+    return perf.stage(name, **kw) if perf is not None else nullcontext({})
@@ -0,0 +1,119 @@
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from parsers.utils import pos_upc_keys
+
+DEFAULT_STORE_PATH = Path(os.environ.get("PRICEBOOK_STORE", Path.home() / ".cache" / "unified2" / "pricebook.sqlite"))
+
+# Local copy of the POS pricebook in SQLite, indexed on the uint64 UPC key. Columns are
+# stored as text under positional names (c0, c1, ...); the real header lives in `meta`.
+# Row ids follow the upload order, so lookups come back in pricebook order.
+class PricebookStore:
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit mode: writes go through _transaction(), so DDL (DROP/CREATE TABLE)
+        # rolls back with the rest instead of committing on its own.
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        # One connection (and one TEMP `wanted` table) may serve several threads, e.g.
+        # app sessions sharing a cached store: every method holds the lock throughout.
+        self._lock = threading.RLock()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN")
+            try:
+                yield
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _meta(self, key: str):
+        with self._lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def columns(self) -> list:
+        cols = self._meta("columns")
+        return json.loads(cols) if cols else []
+
+    @property
+    def digest(self) -> str:
+        # Content hash of the upload the stored pricebook was loaded from, if given.
+        return self._meta("digest")
+
+    def __len__(self):
+        with self._lock:
+            if not self.columns:
+                return 0
+            return self.conn.execute("SELECT COUNT(*) FROM pricebook").fetchone()[0]
+
+    def load_csv(self, pos_csv_file, chunksize: int = 200_000, digest: str = None) -> int:
+        # Replace the stored pricebook with a full upload, chunk by chunk. All or
+        # nothing: if the file fails partway, the previous pricebook is kept.
+        n = 0
+        with self._transaction():
+            self.conn.execute("DROP TABLE IF EXISTS pricebook")
+            self.conn.execute("DELETE FROM meta WHERE key IN ('columns', 'digest')")
+            if digest:
+                self.conn.execute("INSERT INTO meta VALUES ('digest', ?)", (digest,))
+            reader = pd.read_csv(pos_csv_file, dtype=str, keep_default_na=False, na_values=[], chunksize=chunksize)
+            for chunk in reader:
+                if n == 0:
+                    cols = list(chunk.columns)
+                    defs = ", ".join(f"c{i} TEXT" for i in range(len(cols)))
+                    self.conn.execute(f"CREATE TABLE pricebook (rowid INTEGER PRIMARY KEY, upc_key INTEGER NOT NULL, {defs})")
+                    self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('columns', ?)", (json.dumps(cols),))
+                keys = pos_upc_keys(chunk).astype(np.int64)
+                marks = ", ".join("?" * (len(cols) + 2))
+                rows = zip(range(n + 1, n + len(chunk) + 1), keys.tolist(), *(chunk[c].tolist() for c in cols))
+                self.conn.executemany(f"INSERT INTO pricebook VALUES ({marks})", rows)
+                n += len(chunk)
+            self.conn.execute("CREATE INDEX IF NOT EXISTS pricebook_upc ON pricebook (upc_key)")
+        return n
+
+    def lookup(self, keys: np.ndarray) -> pd.DataFrame:
+        # Pricebook rows whose UPC is in `keys`, indexed by their 0-based upload position.
+        with self._transaction():
+            cols = self.columns
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS wanted (k INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM wanted")
+            self.conn.executemany("INSERT OR IGNORE INTO wanted VALUES (?)",
+                                  ((k,) for k in np.unique(np.asarray(keys, dtype=np.uint64)).astype(np.int64).tolist()))
+            names = ", ".join(f"p.c{i}" for i in range(len(cols)))
+            rows = self.conn.execute(
+                f"SELECT p.rowid, {names} FROM pricebook p JOIN wanted w ON p.upc_key = w.k ORDER BY p.rowid"
+            ).fetchall()
+        df = pd.DataFrame.from_records(rows, columns=["_rowid"] + cols)
+        df.index = pd.Index(df.pop("_rowid").to_numpy(dtype=np.int64) - 1)
+        return df
+
+    def apply_updates(self, pos_update_df: pd.DataFrame) -> int:
+        # Write process()'s changed cost_qty/cost_cents back, matched on the UPC key.
+        if pos_update_df is None or pos_update_df.empty:
+            return 0
+        keys = pos_upc_keys(pos_update_df).astype(np.int64).tolist()
+        with self._transaction():
+            cols = self.columns
+            sets = [c for c in ["cost_qty", "cost_cents"] if c in cols and c in pos_update_df.columns]
+            if not sets:
+                return 0
+            values = [pos_update_df[c].astype(object).where(pos_update_df[c].notna(), "").astype(str).tolist() for c in sets]
+            assign = ", ".join(f"c{cols.index(c)} = ?" for c in sets)
+            cur = self.conn.executemany(f"UPDATE pricebook SET {assign} WHERE upc_key = ?", zip(*values, keys))
+        return cur.rowcount
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
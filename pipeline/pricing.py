@@ -0,0 +1,137 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MARGIN = 0.40
+DELTA_TOLERANCE = 0.005  # goal moves under half a cent show as "="
+BASE_COLS = ["Brand","Description","Pack","Size","Cost","+Cost","Unit"]
+
+class MarginTarget(NamedTuple):
+    margin: float           # gross margin on the shelf price, 0 <= margin < 1
+    by: str = None          # POS column (or "vendor") whose value picks a margin from overrides
+    overrides: dict = None  # upper-cased value of `by` -> margin; other rows get `margin`
+    label: str = None
+
+    @property
+    def name(self) -> str:
+        if self.label:
+            return self.label
+        return f"{self.by}%" if self.by else f"{self.margin * 100:g}%"
+
+DEFAULT_TARGETS = (MarginTarget(DEFAULT_MARGIN),)
+
+def _pct(text: str) -> float:
+    try:
+        m = float(str(text).strip().rstrip("%")) / 100
+    except ValueError:
+        raise ValueError(f"margin must be a percentage, got {text!r}") from None
+    if not 0 <= m < 1:
+        raise ValueError(f"margin must be at least 0% and under 100%, got {text!r}")
+    return m
+
+def parse_target(spec: str) -> MarginTarget:
+    # "35" -> 35% on every row. "dept:BEER=25,WINE=30,*=35" -> margin by the dept
+    # column; rows with another dept get the "*" margin (DEFAULT_MARGIN if none).
+    # A "NAME@" prefix names the target's columns, e.g. "beer@dept:BEER=25".
+    spec = spec.strip()
+    label, at, rest = spec.partition("@")
+    if at and ":" not in label:
+        spec, label = rest.strip(), label.strip() or None
+    else:
+        label = None
+    if ":" not in spec:
+        return MarginTarget(_pct(spec), label=label)
+    by, _, pairs = spec.partition(":")
+    default, overrides = DEFAULT_MARGIN, {}
+    for pair in filter(None, (p.strip() for p in pairs.split(","))):
+        key, sep, val = pair.rpartition("=")
+        if not sep:
+            raise ValueError(f"expected VALUE=PERCENT in {spec!r}, got {pair!r}")
+        if key.strip() == "*":
+            default = _pct(val)
+        else:
+            overrides[key.strip().upper()] = _pct(val)
+    return MarginTarget(default, by.strip(), overrides, label)
+
+def parse_targets(specs) -> tuple:
+    # One spec per entry (blank entries skipped); DEFAULT_TARGETS when there are none.
+    targets = tuple(parse_target(s) for s in specs if s and s.strip())
+    names = [t.name for t in targets]
+    if len(set(names)) < len(names):
+        raise ValueError(f"margin targets need distinct names, got {names}; name them with NAME@, e.g. beer@dept:BEER=25")
+    return targets or DEFAULT_TARGETS
+
+def target_columns(target: MarginTarget, primary: bool) -> tuple:
+    # (goal from +Cost, goal from Cost, delta) column names; the first target keeps
+    # the plain "Delta" header.
+    return f"D{target.name}", target.name, "Delta" if primary else f"Delta {target.name}"
+
+def goal_sheet_columns(targets=DEFAULT_TARGETS) -> list:
+    d, c, delta = target_columns(targets[0], True)
+    cols = BASE_COLS + [d, c, "$Now", delta]
+    for t in targets[1:]:
+        cols += list(target_columns(t, False))
+    return cols
+
+def _num(s) -> np.ndarray:
+    return pd.to_numeric(s, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+def row_margins(target: MarginTarget, values, n: int) -> np.ndarray:
+    # Margin per row: one hash pass over `values` plus a lookup per distinct value.
+    if not target.by or not target.overrides or values is None:
+        return np.full(n, target.margin)
+    codes, uniques = pd.factorize(pd.Series(values, copy=False))
+    lut = np.array([target.overrides.get(str(u).strip().upper(), target.margin) for u in uniques] + [target.margin])
+    return lut[codes]  # code -1 (missing) picks the trailing default
+
+def round_cents(x: np.ndarray) -> np.ndarray:
+    # round(v, 2) for every element: correctly rounded, ties to even. np.round(x, 2)
+    # rounds x * 100 first, which flips some half-cent cases, so the product's
+    # rounding error is recovered exactly (Dekker split) and settles those.
+    a = np.abs(x)
+    p = a * 100
+    c = a * 134217729.0
+    hi = c - (c - a)
+    err = (hi * 100 - p) + (a - hi) * 100
+    k = np.floor(p)
+    frac = p - k
+    up = (frac > 0.5) | ((frac == 0.5) & ((err > 0) | ((err == 0) & (k % 2 == 1))))
+    return np.copysign((k + up) / 100, x)
+
+def delta_column(delta: np.ndarray, tolerance: float = DELTA_TOLERANCE) -> np.ndarray:
+    # Rounded to the cent; "=" where the goal moved less than `tolerance`.
+    with np.errstate(invalid="ignore"):
+        out = round_cents(delta)
+    close = np.abs(delta) < tolerance
+    if close.any():
+        out = out.astype(object)
+        out[close] = "="
+    return out
+
+def goal_sheet(rows: pd.DataFrame, now_cents=None, targets=DEFAULT_TARGETS, groups: dict = None,
+               tolerance: float = DELTA_TOLERANCE) -> pd.DataFrame:
+    # Goal Sheet columns for matched lines, computed column-wise in one pass.
+    # rows: invoice Brand/Description/Pack/Size/Cost/+Cost plus the POS
+    # cost_cents_num/cost_qty_num; now_cents: the POS shelf price in cents;
+    # groups: `by` name -> values aligned with rows, for targets with overrides.
+    n = len(rows)
+    groups = groups or {}
+    pack = _num(rows["Pack"])
+    pack = np.where(pack > 0, pack, 1)  # _num can hand back a read-only Arrow view
+    cost, plus = _num(rows["Cost"]), _num(rows["+Cost"])
+    unit = plus / pack
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pos_unit = _num(rows["cost_cents_num"]) / 100.0 / _num(rows["cost_qty_num"])
+    cols = {"Brand": rows["Brand"], "Description": rows["Description"], "Pack": pack,
+            "Size": rows["Size"], "Cost": cost, "+Cost": plus, "Unit": unit}
+    for i, t in enumerate(targets):
+        keep = 1 - row_margins(t, groups.get(t.by), n)
+        d, c, delta = target_columns(t, i == 0)
+        cols[d] = unit / keep
+        cols[c] = (cost / pack) / keep
+        if i == 0:
+            cols["$Now"] = _num(now_cents) / 100.0 if now_cents is not None else np.full(n, np.nan)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cols[delta] = delta_column(cols[d] - pos_unit / keep, tolerance)
+    return pd.DataFrame(cols, index=rows.index)[goal_sheet_columns(targets)]
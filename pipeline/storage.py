@@ -0,0 +1,30 @@
+import os
+import re
+import uuid
+from pathlib import Path
+
+import pandas as pd
+
+def slug(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").lower()
+
+def write_parquet(df: pd.DataFrame, path: Path, stringify: bool = False) -> bool:
+    # Written to a temp file beside `path` and moved into place, so readers never see
+    # a partial file. Frames pyarrow can't encode (mixed object columns, e.g. dates
+    # next to strings) get those columns stored as text with stringify, otherwise
+    # nothing is written and this returns False.
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    try:
+        try:
+            df.to_parquet(tmp, index=False)
+        except Exception:
+            if not stringify:
+                return False
+            df = df.copy()
+            for c in df.columns[df.dtypes == object]:
+                df[c] = df[c].where(df[c].isna(), df[c].astype(str))
+            df.to_parquet(tmp, index=False)
+        os.replace(tmp, path)
+        return True
+    finally:
+        tmp.unlink(missing_ok=True)
@@ -0,0 +1,46 @@
+import pandas as pd
+from openpyxl import Workbook
+
+def excel_rows(df: pd.DataFrame):
+    # Row lists with NaN/NA/NaT as None, one column converted at a time.
+    cols = []
+    for c in df.columns:
+        s = df[c]
+        vals = s.astype(object).to_numpy()
+        vals[s.isna().to_numpy()] = None
+        cols.append(vals)
+    return zip(*cols) if cols else iter(())
+
+# Constant-memory .xlsx output: rows go straight into openpyxl write-only sheets,
+# which may be appended to in any order until close().
+class XlsxStreamWriter:
+    def __init__(self, target):
+        self.target = target
+        self.book = Workbook(write_only=True)
+        self.sheets = {}
+
+    def add_sheet(self, name: str, columns, header: bool = True):
+        ws = self.book.create_sheet(title=name[:31])
+        if header:
+            ws.append([str(c) for c in columns])
+        self.sheets[name] = (ws, list(columns))
+
+    def append(self, name: str, df: pd.DataFrame):
+        ws, columns = self.sheets[name]
+        for row in excel_rows(df[columns]):
+            ws.append(list(row))
+
+    def write_frame(self, name: str, df: pd.DataFrame):
+        self.add_sheet(name, df.columns)
+        self.append(name, df)
+
+    def close(self):
+        self.book.save(self.target)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.close()
+        return False
@@ -0,0 +1,9 @@
+from parsers import ALL_PARSERS
+from parsers.detect import Fingerprinter
+
+def test_near_tie_is_ambiguous():
+    fp = Fingerprinter(ALL_PARSERS)
+    det = fp.detect("ITEM#,UPC,SIZE:,QTY")
+    assert det.hits["Southern Glazer's"] == 3 and det.hits["Nevada Beverage"] == 2
+    assert det.parser.name == "Southern Glazer's" and det.ambiguous
+    assert not Fingerprinter(ALL_PARSERS, min_confidence=0.3).detect("ITEM#,UPC,SIZE:,QTY").ambiguous
@@ -0,0 +1,30 @@
+import random
+
+import pandas as pd
+import pytest
+
+from parsers.nevada_beverage import NevadaBeverageParser
+from parsers.southern_glazers import SouthernGlazersParser
+
+FRAGMENTS = [
+    "ITEM# 123 Foo bar UPC: 0-12345-67890 $12.99", "ITEM# 55 Wine U.P.C. 123456789012 $9.99", "ITEM# 9 x",
+    "UPC: 0-12345-67890", "UPC 12345678901", "U.P.C. 0001234567890", "SIZE: 750 Z", "Unit Net Amount: $1,234.50",
+    "CS ORD/DLV: 3/2", "Invoice Date: 01/02/2024", "Nevada Beverage Co", "Remit to", "", "$1,000.5", "TOTAL due",
+]
+HEADER = "ITEM# U.P.C. UPC QTY DESCRIPTION"
+
+def random_pages(rng: random.Random, lines: list) -> list:
+    cuts = sorted(rng.sample(range(1, len(lines)), min(len(lines) - 1, rng.randint(0, 6)))) if len(lines) > 1 else []
+    return [lines[a:b] for a, b in zip([0] + cuts, cuts + [len(lines)])]
+
+@pytest.mark.parametrize("parser", [NevadaBeverageParser(), SouthernGlazersParser()], ids=lambda p: p.name)
+def test_page_splits_match_the_joined_lines(parser):
+    rng = random.Random(0)
+    for _ in range(120):
+        lines = [rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 150))]
+        if rng.random() < 0.7:
+            lines.insert(rng.randint(0, min(len(lines), 120)), HEADER)
+        joined = pd.Series(lines, dtype=object)
+        want = parser.parse_lines(joined.iloc[parser.header_end(joined):]).reset_index(drop=True)
+        got = parser.parse_pages(random_pages(rng, lines)).reset_index(drop=True)
+        pd.testing.assert_frame_equal(got, want, check_dtype=False)
@@ -0,0 +1,56 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from parsers.utils import normalize_pos_upc_series, upc_keys
+from pipeline import PricebookStore
+
+GOOD = "Upc,Name,cost_qty,cost_cents\n049000028904,Coke,1,200\n012345678905,Chips,1,100\n"
+
+def test_failed_reload_keeps_previous_pricebook(tmp_path):
+    store = PricebookStore(tmp_path / "pb.sqlite")
+    assert store.load_csv(io.StringIO(GOOD)) == 2
+    bad = "Upc,Name,cost_qty,cost_cents\n" + "049000028904,Coke,1,250\n" * 20_000 + '012345678905,"Chips,1,100\n'
+    try:
+        store.load_csv(io.StringIO(bad), chunksize=1000)
+    except Exception:
+        pass
+    else:
+        raise AssertionError("malformed CSV loaded")
+    assert store.columns == ["Upc", "Name", "cost_qty", "cost_cents"]
+    assert len(store) == 2
+    rows = store.lookup(np.array([49000028904], dtype=np.uint64))
+    assert rows["cost_cents"].tolist() == ["200"]
+    store.close()
+    assert len(PricebookStore(tmp_path / "pb.sqlite")) == 2
+
+def test_digest_follows_the_loaded_upload(tmp_path):
+    store = PricebookStore(tmp_path / "pb.sqlite")
+    assert store.digest is None
+    store.load_csv(io.StringIO(GOOD), digest="abc")
+    assert store.digest == "abc"
+    try:
+        store.load_csv(io.StringIO('Upc,Name\n1,"x\n'), digest="def")
+    except Exception:
+        pass
+    assert store.digest == "abc"
+    store.load_csv(io.StringIO(GOOD))
+    assert store.digest is None
+
+def test_concurrent_lookups_share_one_store(tmp_path):
+    store = PricebookStore(tmp_path / "pb.sqlite")
+    upcs = [f"{i:011d}" for i in range(1, 401)]
+    store.load_csv(io.StringIO("Upc,Name\n" + "".join(f"{u},n{i}\n" for i, u in enumerate(upcs))))
+    all_keys = upc_keys(normalize_pos_upc_series(pd.Series(upcs)))
+    bad = []
+
+    def work(i):
+        for _ in range(20):
+            if store.lookup(all_keys[i::8]).index.tolist() != list(range(i, 400, 8)):
+                bad.append(i)
+
+    with ThreadPoolExecutor(8) as ex:
+        list(ex.map(work, range(8)))
+    assert not bad
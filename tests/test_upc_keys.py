@@ -0,0 +1,17 @@
+import pandas as pd
+
+from parsers.utils import normalize_pos_upc_series, upc_keys
+from pipeline import AUTO_DETECT, process
+
+def test_unicode_digit_upcs_key_like_ascii():
+    raw = pd.Series(["０１２３４５６７８９０５", "012345678905", None])
+    assert upc_keys(normalize_pos_upc_series(raw)).tolist() == [12345678905, 12345678905, 0]
+    arrow = raw.astype("string[pyarrow]")
+    assert upc_keys(normalize_pos_upc_series(arrow)).tolist() == [12345678905, 12345678905, 0]
+
+def test_process_with_unicode_digit_pos_upc(tmp_path):
+    pos = tmp_path / "pos.csv"
+    pos.write_text("Upc,Name,cost_cents,cost_qty\n０１２３４５６７８９０５,Fullwidth,100,1\n049000028904,Coke,200,1\n", encoding="utf-8")
+    with open(pos, "rb") as f:
+        res = process(f, [], AUTO_DETECT)
+    assert res.errors == [] and len(res.full_export_df) == 0